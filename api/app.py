@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import sys
 import os
@@ -39,8 +39,7 @@ from modules.ai_engine import (
     generate_threat_hunting_queries,
 )
 from modules.content_fetcher import (
-    get_dynamic_image_urls,
-    extract_image_urls_static,
+    collect_image_urls,
     extract_text_from_images,
     fetch_page_content,
     extract_text_from_pdf_bytes,
@@ -219,7 +218,6 @@ from modules.sigma_matcher import (
 )
 from modules.ai.provider_factory import get_provider, get_available_providers
 from modules.database import init_db, ReportRepository, RuleRepository, TokenUsageRepository
-from modules.session_manager import session_manager
 from modules.middleware import rate_limit, validate_json_content_type
 from modules.security import (
     validate_url,
@@ -271,21 +269,23 @@ def _extract_provider_params(data):
     Priority: session token > request body > defaults.
     """
     api_key = ''
-    provider_name = data.get('provider', 'openai')
-    model_name = data.get('model', None)
+    provider_in = data.get('provider')
+    model_name = data.get('model')
+    provider_name = 'openai' if provider_in is None else provider_in
 
     # 1) Try session token first (from X-Session-Token header)
-    session_token = request.headers.get('X-Session-Token')
-    if session_token:
-        session_data = session_manager.validate_session(session_token)
-        if session_data:
+    if session_token := request.headers.get('X-Session-Token'):
+        # Imported on first use: building the session manager derives the
+        # Fernet key, which requests without a session never need
+        from modules.session_manager import session_manager
+        if session_data := session_manager.validate_session(session_token):
             api_key = session_data['api_key']
             # Session provider/model override request body if not explicitly set
-            if not data.get('provider'):
+            if not provider_in:
                 provider_name = session_data.get('provider', 'openai')
-            if not data.get('model') and session_data.get('model_preference'):
-                model_name = session_data['model_preference']
-            logger.info(f"API key resolved from session token (provider: {provider_name})")
+            if not model_name:
+                model_name = session_data.get('model_preference') or model_name
+            logger.info("API key resolved from session token (provider: %s)", provider_name)
         else:
             logger.warning("Invalid or expired session token provided")
 
@@ -295,9 +295,9 @@ def _extract_provider_params(data):
 
     # Auto-detect provider from key prefix if not specified
     if provider_name == 'openai' and api_key:
-        if api_key.startswith('sk-ant-'):
+        if api_key[:7] == 'sk-ant-':
             provider_name = 'anthropic'
-        elif api_key.startswith('AIza'):
+        elif api_key[:4] == 'AIza':
             provider_name = 'google'
 
     return api_key, provider_name, model_name
@@ -348,9 +348,7 @@ def analyze_url():
 
         # Collect images
         try:
-            static_imgs = extract_image_urls_static(soup, url)
-            dynamic_imgs = get_dynamic_image_urls(url)
-            all_imgs = list(set(static_imgs + dynamic_imgs))
+            all_imgs = collect_image_urls(soup, url)
         except Exception as e:
             logger.error(f"Error extracting images: {str(e)}")
             all_imgs = []
@@ -371,14 +369,36 @@ def analyze_url():
                 "The page may require JavaScript rendering or may be blocking automated access."
             )
 
-        # Threat summary
-        try:
-            threat_summary = summarize_threat_report(
+        # Threat summary, IoC/TTP extraction and AI Sigma generation don't depend
+        # on each other; run the three AI calls concurrently so the request waits
+        # for the slowest one rather than their sum.
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            future_summary = executor.submit(
+                summarize_threat_report,
                 text=combined_text,
                 openai_api_key=openai_api_key,
                 provider_name=provider_name,
                 model_name=model_name,
             )
+            future_ioc = executor.submit(
+                extract_iocs_ttps_gpt,
+                combined_text,
+                openai_api_key=openai_api_key,
+                provider_name=provider_name,
+                model_name=model_name,
+            )
+            future_ai_sigma = executor.submit(
+                generate_more_sigma_rules_from_article,
+                article_text=text_content,
+                images_ocr_text=images_ocr_text,
+                openai_api_key=openai_api_key,
+                provider_name=provider_name,
+                model_name=model_name,
+            )
+
+        # Threat summary
+        try:
+            threat_summary = future_summary.result()
         except Exception as e:
             logger.error(f"Error generating threat summary: {str(e)}")
             threat_summary = "Error generating threat summary"
@@ -387,12 +407,7 @@ def analyze_url():
         try:
             from modules.pipeline.output_validator import OutputValidator as OV
 
-            gpt_json_str = extract_iocs_ttps_gpt(
-                combined_text,
-                openai_api_key=openai_api_key,
-                provider_name=provider_name,
-                model_name=model_name,
-            )
+            gpt_json_str = future_ioc.result()
             # Use OutputValidator with repair (handles \escape, truncation, etc.)
             is_valid, parsed = OV.validate_json(gpt_json_str)
             if is_valid and isinstance(parsed, dict):
@@ -440,13 +455,7 @@ def analyze_url():
 
         # AI-generated Sigma rules (from article text via AI)
         try:
-            more_sigma_rules = generate_more_sigma_rules_from_article(
-                article_text=text_content,
-                images_ocr_text=images_ocr_text,
-                openai_api_key=openai_api_key,
-                provider_name=provider_name,
-                model_name=model_name,
-            )
+            more_sigma_rules = future_ai_sigma.result()
 
             if more_sigma_rules and not more_sigma_rules.startswith("Error"):
                 rules = []
@@ -589,7 +598,7 @@ def analyze_url():
 
         # Save report to database
         report_data = {
-            'id': str(uuid.uuid4()),
+            'id': uuid.uuid4().hex,
             'url': url,
             'timestamp': datetime.now().isoformat(),
             'provider': provider_name,
@@ -669,9 +678,7 @@ def analyze_url_stream():
 
             images_ocr_text = ""
             try:
-                static_imgs = extract_image_urls_static(soup, url)
-                dynamic_imgs = get_dynamic_image_urls(url)
-                all_imgs = list(set(static_imgs + dynamic_imgs))
+                all_imgs = collect_image_urls(soup, url)
                 if all_imgs:
                     images_ocr_text = extract_text_from_images(all_imgs)
             except Exception as e:
@@ -1017,7 +1024,7 @@ def analyze_url_stream():
             # Save to database
             try:
                 report_data = {
-                    'id': str(uuid.uuid4()),
+                    'id': uuid.uuid4().hex,
                     'url': url,
                     'timestamp': datetime.now().isoformat(),
                     'provider': provider_name,
@@ -1434,7 +1441,7 @@ def analyze_pdf_stream():
             # Save to database
             try:
                 report_data = {
-                    'id': str(uuid.uuid4()),
+                    'id': uuid.uuid4().hex,
                     'url': f"pdf://{pdf_filename}",
                     'timestamp': datetime.now().isoformat(),
                     'provider': provider_name,
@@ -1515,7 +1522,7 @@ def generate_rule():
 
         # Save the rule to storage
         rule_data = {
-            'id': str(uuid.uuid4()),
+            'id': uuid.uuid4().hex,
             'title': result["rule"].get("title", "Untitled Rule"),
             'description': result["rule"].get("description", ""),
             'author': result["rule"].get("author", "PERSEPTOR"),
@@ -1551,16 +1558,33 @@ def generate_rule():
         print(f"Error in generate_rule: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+def _stream_json_list(key: str, items) -> Response:
+    """
+    Stream {key: [...], "count": n} one item at a time instead of building
+    the whole list. The first item is fetched up front so database errors
+    still surface as a 500 before any output is sent.
+    """
+    first = next(items, None)
+
+    def generate():
+        count = 0
+        yield f'{{"{key}": ['
+        if first is not None:
+            yield app.json.dumps(first)
+            count = 1
+            for item in items:
+                yield "," + app.json.dumps(item)
+                count += 1
+        yield f'], "count": {count}}}'
+
+    return Response(generate(), mimetype='application/json')
+
 @app.route('/api/rules', methods=['GET'])
 @rate_limit("read")
 def get_rules():
     """Get all created rules from database"""
     try:
-        rules = RuleRepository.list_all()
-        return jsonify({
-            'rules': rules,
-            'count': len(rules)
-        })
+        return _stream_json_list('rules', RuleRepository.iter_all())
     except Exception as e:
         logger.error(f"Error fetching rules: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -1605,11 +1629,7 @@ def download_rule(rule_id):
 def get_reports():
     """Get all analyzed reports from database"""
     try:
-        reports = ReportRepository.list_all()
-        return jsonify({
-            'reports': reports,
-            'count': len(reports)
-        })
+        return _stream_json_list('reports', ReportRepository.iter_all())
     except Exception as e:
         logger.error(f"Error fetching reports: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -1643,6 +1663,7 @@ def create_session():
         if not api_key:
             return jsonify({'error': 'api_key is required'}), 400
 
+        from modules.session_manager import session_manager
         result = session_manager.create_session(api_key, provider, model)
         return jsonify(result)
     except Exception as e:
@@ -1657,6 +1678,7 @@ def destroy_session():
         if not token:
             return jsonify({'error': 'X-Session-Token header required'}), 400
 
+        from modules.session_manager import session_manager
         session_manager.destroy_session(token)
         return jsonify({'message': 'Session destroyed'})
     except Exception as e:
@@ -1671,6 +1693,7 @@ def get_usage():
         session_token = request.headers.get('X-Session-Token')
         session_id = None
         if session_token:
+            from modules.session_manager import session_manager
             session_data = session_manager.validate_session(session_token)
             if session_data:
                 session_id = session_data.get('session_id')
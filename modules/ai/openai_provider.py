@@ -3,8 +3,9 @@ PERSEPTOR v2.0 - OpenAI Provider
 Supports GPT-4.1, GPT-4o, O-series reasoning models.
 """
 
+import logging
 import time
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from modules.ai.base_provider import AIProvider, AIResponse, Message, ModelInfo, TokenUsage
 from modules.logging_config import get_logger
 
@@ -16,6 +17,18 @@ O_SERIES_MODELS = frozenset({
     "o3", "o3-mini", "o3-mini-2024-09-12",
     "o4", "o4-mini", "o4-mini-2025-04-16",
 })
+_O_SERIES_PREFIXES = ("o1", "o3", "o4")
+
+
+def is_o_series(model_id: str) -> bool:
+    """Check whether a model ID belongs to the O-series reasoning family.
+
+    Matches the listed IDs as well as future dated/suffixed variants
+    (e.g. "o3-pro", "o4-mini-2026-01-01") that are not yet in O_SERIES_MODELS.
+    """
+    if not model_id:
+        return False
+    return model_id.startswith(_O_SERIES_PREFIXES) and model_id[2:3] in ("", "-")
 
 OPENAI_MODELS = [
     ModelInfo(
@@ -70,6 +83,8 @@ class OpenAIProvider(AIProvider):
         except ImportError:
             # Fallback to langchain
             self._client = None
+        # LangChain chat models keyed by (model_id, temperature), built on first use
+        self._langchain_models: Dict[Tuple[str, Optional[float]], object] = {}
         logger.info(f"OpenAI provider initialized with model: {default_model}")
 
     @property
@@ -93,13 +108,13 @@ class OpenAIProvider(AIProvider):
 
     def _generate_native(self, messages, model_id, temperature, max_tokens, start_time, **kwargs):
         """Generate using OpenAI native SDK."""
-        is_o_series = model_id in O_SERIES_MODELS
+        o_series = is_o_series(model_id)
 
         # O-series models: "system" → "developer", drop "assistant" few-shot messages
         formatted = []
         for m in messages:
             role = m.role
-            if is_o_series:
+            if o_series:
                 if role == "system":
                     role = "developer"
                 elif role == "assistant":
@@ -114,7 +129,7 @@ class OpenAIProvider(AIProvider):
 
         # O-series reasoning models require max_completion_tokens instead of max_tokens
         # and don't accept the temperature parameter
-        if is_o_series:
+        if o_series:
             params["max_completion_tokens"] = max_tokens
         else:
             params["max_tokens"] = max_tokens
@@ -132,7 +147,8 @@ class OpenAIProvider(AIProvider):
             logger.warning(f"Model refusal: {content[:200]}")
 
         # Log first 300 chars for debugging
-        logger.debug(f"Raw response content (first 300): {content[:300]}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Raw response content (first 300): {content[:300]}")
 
         usage = TokenUsage(
             prompt_tokens=response.usage.prompt_tokens if response.usage else 0,
@@ -165,11 +181,14 @@ class OpenAIProvider(AIProvider):
         from langchain_openai import ChatOpenAI
         from langchain_core.messages import HumanMessage, SystemMessage
 
-        params = {"model": model_id, "openai_api_key": self.api_key}
-        if model_id not in O_SERIES_MODELS:
-            params["temperature"] = temperature
-
-        llm = ChatOpenAI(**params)
+        o_series = is_o_series(model_id)
+        cache_key = (model_id, None if o_series else temperature)
+        llm = self._langchain_models.get(cache_key)
+        if llm is None:
+            params = {"model": model_id, "openai_api_key": self.api_key}
+            if not o_series:
+                params["temperature"] = temperature
+            llm = self._langchain_models[cache_key] = ChatOpenAI(**params)
 
         lc_messages = []
         for m in messages:
@@ -208,7 +227,7 @@ class OpenAIProvider(AIProvider):
         if self._client:
             formatted = [{"role": m.role, "content": m.content} for m in messages]
             params = {"model": model_id, "messages": formatted, "stream": True}
-            if model_id in O_SERIES_MODELS:
+            if is_o_series(model_id):
                 params["max_completion_tokens"] = max_tokens
             else:
                 params["max_tokens"] = max_tokens
@@ -3,6 +3,8 @@ PERSEPTOR v2.0 - AI Provider Factory
 Creates and caches provider instances based on configuration.
 """
 
+import functools
+import hashlib
 import threading
 from typing import Optional, Dict, List
 from modules.ai.base_provider import AIProvider, ModelInfo
@@ -15,9 +17,9 @@ _provider_cache: Dict[str, AIProvider] = {}
 _provider_lock = threading.Lock()
 
 
+@functools.lru_cache(maxsize=32)
 def _hash_key(api_key: str) -> str:
     """Create a short hash of the API key for caching (not for security)."""
-    import hashlib
     return hashlib.sha256(api_key.encode()).hexdigest()[:16]
 
 
@@ -46,8 +48,18 @@ def get_provider(
     if not api_key:
         raise ValueError(f"API key is required for provider '{provider_name}'")
 
+    # Normalize before keying so "OpenAI" and "openai" share one client
+    provider_name = provider_name.lower().strip()
     cache_key = f"{provider_name}:{_hash_key(api_key)}"
 
+    # Lock-free fast path: every AI engine call resolves its provider here,
+    # and after warm-up the instance (and its HTTP connection pool) exists.
+    provider = _provider_cache.get(cache_key)
+    if provider is not None:
+        if model:
+            provider.default_model = model
+        return provider
+
     # Thread-safe cache check + creation to prevent triple initialization
     # from ThreadPoolExecutor concurrent calls
     with _provider_lock:
@@ -58,8 +70,6 @@ def get_provider(
                 provider.default_model = model
             return provider
 
-        provider_name = provider_name.lower().strip()
-
         if provider_name == "openai":
             from modules.ai.openai_provider import OpenAIProvider
             provider = OpenAIProvider(
@@ -17,6 +17,11 @@ from modules.pipeline.output_validator import OutputValidator
 from modules.pipeline.cache import get_cache, ResponseCache
 from modules.logging_config import get_logger
 
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
+
 logger = get_logger("ai_engine")
 
 # Prompt version — increment when prompts change to invalidate cached results
@@ -53,18 +58,74 @@ def _track_usage(response, endpoint: str = "unknown"):
 def safe_json_parse(json_str: str) -> dict:
     """Safely parse a JSON string, returning a dictionary or empty {} on error."""
     try:
+        if orjson is not None:
+            try:
+                return orjson.loads(json_str)
+            except orjson.JSONDecodeError:
+                pass  # stdlib json also accepts NaN/Infinity literals
         return json.loads(json_str)
     except Exception as e:
         logger.warning(f"JSON parse error: {e}")
         return {}
 
 
+_JSON_FENCE_RE = re.compile(r'```\s*[jJ][sS][oO][nN]\s*\n')
+_JSON_CLOSERS = {"{": "}", "[": "]"}
+_JSON_OPENER_RE = re.compile(r'[{\[]')
+
+
+def _find_json_end(text: str, start: int) -> int:
+    """
+    Return the index just past the bracket that balances text[start], or -1
+    if it is never closed. Single pass; brackets inside strings are ignored.
+    """
+    stack = [_JSON_CLOSERS[text[start]]]
+    in_string = False
+    escape = False
+    for i in range(start + 1, len(text)):
+        ch = text[i]
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{" or ch == "[":
+            stack.append(_JSON_CLOSERS[ch])
+        elif ch == "}" or ch == "]":
+            if ch != stack.pop():
+                return -1
+            if not stack:
+                return i + 1
+    return -1
+
+
+def _json_value_follows(text: str, pos: int) -> bool:
+    """True if a complete, parseable JSON object or array starts after pos."""
+    match = _JSON_OPENER_RE.search(text, pos)
+    while match:
+        end = _find_json_end(text, match.start())
+        if end != -1:
+            try:
+                json.loads(text[match.start():end])
+                return True
+            except ValueError:
+                pass
+            match = _JSON_OPENER_RE.search(text, end)
+        else:
+            match = _JSON_OPENER_RE.search(text, match.end())
+    return False
+
+
 def extract_json_from_response(text: str) -> str:
     """Extract JSON from an AI response that may contain markdown code blocks."""
     text = text.strip()
 
     # Handle ```json or ```JSON (case-insensitive) with optional whitespace
-    fence_match = re.search(r'```\s*[jJ][sS][oO][nN]\s*\n', text)
+    fence_match = _JSON_FENCE_RE.search(text)
     if fence_match:
         start = fence_match.end()
         end = text.find("```", start)
@@ -84,17 +145,21 @@ def extract_json_from_response(text: str) -> str:
             return text[start:end].strip()
         return text[start:].strip()
 
-    # Try to find JSON object
-    json_start = text.find("{")
-    json_end = text.rfind("}") + 1
-    if json_start != -1 and json_end > json_start:
-        return text[json_start:json_end]
-
-    # Try to find JSON array
-    arr_start = text.find("[")
-    arr_end = text.rfind("]") + 1
-    if arr_start != -1 and arr_end > arr_start:
-        return text[arr_start:arr_end]
+    # Start at whichever of '{' or '[' comes first, so an enclosing array is
+    # never cut down to its first element, and take the balanced value. If it
+    # is never closed (truncated output) or another JSON value follows it,
+    # fall back to the span up to the last closing bracket, so nothing is
+    # silently dropped and the output validator can repair or reject it.
+    # Trailing prose such as "{placeholder}" is not valid JSON and is cut.
+    starts = [i for i in (text.find("{"), text.find("[")) if i != -1]
+    if starts:
+        json_start = min(starts)
+        closer = _JSON_CLOSERS[text[json_start]]
+        json_end = _find_json_end(text, json_start)
+        if json_end == -1 or _json_value_follows(text, json_end):
+            json_end = text.rfind(closer) + 1
+        if json_end > json_start:
+            return text[json_start:json_end]
 
     return text
 
@@ -197,6 +197,11 @@ class AppConfig:
             os.path.join(_project_root, "Global_Sigma_Rules")
         )
         self.sigma_rule_author = os.environ.get("SIGMA_RULE_AUTHOR", "PERSEPTOR")
+        # Pre-parsed rule cache; must be writable (the rules dir may be mounted read-only)
+        self.sigma_cache_dir = os.environ.get(
+            "SIGMA_CACHE_DIR",
+            os.path.dirname(self.database.path)
+        )
 
     def get_provider_config(self, provider: str) -> AIProviderConfig:
         """Get configuration for a specific AI provider."""
@@ -6,31 +6,134 @@ Supports: images (static + dynamic), SVG, PDF text extraction.
 
 import os
 import asyncio
+import queue
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from PIL import Image
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
 from PyPDF2 import PdfReader
 from typing import List, Optional
+from modules.database import OcrCacheRepository
 from modules.logging_config import get_logger
 
+try:
+    import pymupdf
+except ImportError:  # optional, much faster PDF text extraction; PyPDF2 is the fallback
+    pymupdf = None
+
 logger = get_logger("content_fetcher")
 
+# Upper bound on a single downloaded image; larger bodies are skipped unread
+MAX_IMAGE_BYTES = 10_000_000
+
+# Content-Type prefixes worth decoding; anything else (typically an HTML error
+# or login page served with 200) is dropped before the body is read. An absent
+# header is let through.
+_IMAGE_CONTENT_TYPES = ("image/", "application/octet-stream", "application/xml", "text/xml")
+
+# Images downloaded and OCR'd concurrently per report. Scales with cores
+# (tesserocr releases the GIL while recognizing) like the stdlib
+# ThreadPoolExecutor default, but never below 8 so downloads still overlap
+# on small hosts.
+OCR_WORKERS = min(32, max(8, (os.cpu_count() or 1) + 4))
+
+# Pages whose static HTML already lists this many images skip the headless browser
+MIN_STATIC_IMAGES = 5
+
+# Cached OCR results are revalidated with ETag/Last-Modified when the server
+# sent them; entries without validators are reused for this many days
+OCR_CACHE_MAX_AGE_DAYS = 7
+
+# Shared keep-alive session for image downloads: report images usually come
+# from one or two hosts, so connections (and TLS handshakes) are reused
+_image_session = requests.Session()
+_image_session.headers["User-Agent"] = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) "
+    "Chrome/131.0.0.0 Safari/537.36"
+)
+_image_adapter = HTTPAdapter(pool_connections=OCR_WORKERS, pool_maxsize=OCR_WORKERS)
+_image_session.mount("http://", _image_adapter)
+_image_session.mount("https://", _image_adapter)
+
 # OCR engine selection: try EasyOCR first, fallback to Tesseract
 _ocr_engine = None
+_ocr_engine_lock = threading.Lock()
+# EasyOCR's reader is shared and not safe for concurrent readtext calls
+_easyocr_lock = threading.Lock()
+
+class _TesserocrPool:
+    """
+    In-process Tesseract via tesserocr, exposing pytesseract's image_to_string.
+    The language model is loaded once per PyTessBaseAPI instead of once per
+    image in a fresh subprocess. Instances are not thread-safe, so each OCR
+    call borrows its own. At most max_instances are created process-wide;
+    once all are in use, further calls wait for one to be returned.
+    """
+
+    def __init__(self, tesserocr, max_instances: int = OCR_WORKERS):
+        self._tesserocr = tesserocr
+        self._idle = queue.SimpleQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._max_instances = max_instances
+
+    def _borrow(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self._max_instances
+            if create:
+                self._created += 1
+        if not create:
+            return self._idle.get()  # blocks until another call returns one
+        try:
+            return self._tesserocr.PyTessBaseAPI()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def image_to_string(self, image: Image.Image) -> str:
+        api = self._borrow()
+        try:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        finally:
+            self._idle.put(api)
+
 
 def _get_ocr_engine():
     """Lazy-load OCR engine. Prefers EasyOCR, falls back to Tesseract."""
-    global _ocr_engine
     if _ocr_engine is not None:
         return _ocr_engine
+    with _ocr_engine_lock:
+        if _ocr_engine is None:
+            _load_ocr_engine()
+    return _ocr_engine
+
 
+def _load_ocr_engine():
+    """Initialize _ocr_engine. Caller holds _ocr_engine_lock."""
+    global _ocr_engine
     try:
         import easyocr
         _ocr_engine = ("easyocr", easyocr.Reader(['en'], gpu=False, verbose=False))
         logger.info("OCR engine: EasyOCR initialized")
     except ImportError:
+        try:
+            import tesserocr
+            _ocr_engine = ("tesseract", _TesserocrPool(tesserocr))
+            logger.info("OCR engine: Tesseract (tesserocr) initialized")
+            return
+        except ImportError:
+            pass
         try:
             import pytesseract
             pytesseract.pytesseract.tesseract_cmd = os.environ.get(
@@ -40,9 +143,7 @@ def _get_ocr_engine():
             logger.info("OCR engine: Tesseract initialized")
         except ImportError:
             _ocr_engine = ("none", None)
-            logger.warning("No OCR engine available (install easyocr or pytesseract)")
-
-    return _ocr_engine
+            logger.warning("No OCR engine available (install easyocr, tesserocr or pytesseract)")
 
 
 def _ocr_image(image: Image.Image) -> str:
@@ -51,8 +152,9 @@ def _ocr_image(image: Image.Image) -> str:
 
     if engine_name == "easyocr":
         import numpy as np
-        img_array = np.array(image.convert("RGB"))
-        results = engine.readtext(img_array, detail=0)
+        img_array = np.array(image if image.mode == "L" else image.convert("RGB"))
+        with _easyocr_lock:
+            results = engine.readtext(img_array, detail=0)
         return " ".join(results)
     elif engine_name == "tesseract":
         return engine.image_to_string(image)
@@ -66,6 +168,7 @@ def _ocr_image(image: Image.Image) -> str:
 async def _fetch_dynamic_images_async(url: str, wait_time: int = 5) -> List[str]:
     """Fetch dynamically-loaded image URLs using Playwright."""
     image_urls = []
+    seen = set()
     try:
         from playwright.async_api import async_playwright
 
@@ -91,8 +194,12 @@ async def _fetch_dynamic_images_async(url: str, wait_time: int = 5) -> List[str]
                     await browser.close()
                     return []
 
-            # Wait for additional lazy-loaded content
-            await page.wait_for_timeout(wait_time * 1000)
+            # Wait for the first image instead of a fixed delay; pages that
+            # never render one just use up the wait
+            try:
+                await page.wait_for_selector("img", state="attached", timeout=wait_time * 1000)
+            except Exception:
+                pass
 
             # Scroll down to trigger lazy loading
             await page.evaluate("""
@@ -112,12 +219,14 @@ async def _fetch_dynamic_images_async(url: str, wait_time: int = 5) -> List[str]
             images = await page.query_selector_all("img")
             for img in images:
                 src = await img.get_attribute("src")
-                if src and src.startswith("http"):
+                if src and src.startswith("http") and src not in seen:
+                    seen.add(src)
                     image_urls.append(src)
 
                 # Check data-src for lazy-loaded images
                 data_src = await img.get_attribute("data-src")
-                if data_src and data_src.startswith("http"):
+                if data_src and data_src.startswith("http") and data_src not in seen:
+                    seen.add(data_src)
                     image_urls.append(data_src)
 
             await browser.close()
@@ -127,7 +236,7 @@ async def _fetch_dynamic_images_async(url: str, wait_time: int = 5) -> List[str]
     except Exception as e:
         logger.error(f"Error fetching dynamic images from {url}: {e}")
 
-    return list(set(image_urls))
+    return image_urls
 
 
 def get_dynamic_image_urls(url: str, wait_time: int = 5) -> List[str]:
@@ -228,15 +337,16 @@ async def _fetch_page_content_async(url: str, wait_time: int = 5) -> dict:
 
             # Extract images
             images = await page.query_selector_all("img")
+            seen = set()
             for img in images:
                 src = await img.get_attribute("src")
-                if src and src.startswith("http"):
+                if src and src.startswith("http") and src not in seen:
+                    seen.add(src)
                     result["images"].append(src)
                 data_src = await img.get_attribute("data-src")
-                if data_src and data_src.startswith("http"):
+                if data_src and data_src.startswith("http") and data_src not in seen:
+                    seen.add(data_src)
                     result["images"].append(data_src)
-
-            result["images"] = list(set(result["images"]))
             await browser.close()
 
     except ImportError:
@@ -272,87 +382,206 @@ def fetch_page_content(url: str, wait_time: int = 5) -> dict:
 def extract_image_urls_static(soup: BeautifulSoup, base_url: str) -> List[str]:
     """Extract image URLs from parsed HTML (static, no JS)."""
     image_urls = []
+    seen = set()
     for img_tag in soup.find_all('img'):
         src = img_tag.get('src') or img_tag.get('data-src')
         if src:
             full_url = urljoin(base_url, src)
-            image_urls.append(full_url)
-    return list(set(image_urls))
+            if full_url not in seen:
+                seen.add(full_url)
+                image_urls.append(full_url)
+    return image_urls
+
+
+def collect_image_urls(soup: BeautifulSoup, base_url: str) -> List[str]:
+    """
+    Image URLs for a page: static <img> tags, plus Playwright-rendered ones
+    only when the static HTML has fewer than MIN_STATIC_IMAGES.
+    """
+    static_urls = extract_image_urls_static(soup, base_url)
+    if len(static_urls) >= MIN_STATIC_IMAGES:
+        return static_urls
+    return list(dict.fromkeys(static_urls + get_dynamic_image_urls(base_url)))
 
 
 # ─── Image OCR Processing ────────────────────────────────────────────────────
 
-def extract_text_from_images(image_urls: List[str], max_images: int = 30) -> str:
-    """Extract text from a list of image URLs using OCR."""
-    all_text = []
-    processed = 0
+def _read_capped(resp: requests.Response, limit: int) -> Optional[bytes]:
+    """Read a streamed response body, returning None if it exceeds `limit` bytes."""
+    try:
+        declared = int(resp.headers.get("Content-Length", "0"))
+    except ValueError:
+        declared = 0
+    if declared > limit:
+        return None
+
+    chunks = []
+    received = 0
+    for chunk in resp.iter_content(chunk_size=64 * 1024):
+        received += len(chunk)
+        if received > limit:
+            return None
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def _ocr_cache_get(image_url: str) -> Optional[dict]:
+    try:
+        return OcrCacheRepository.get(image_url, OCR_CACHE_MAX_AGE_DAYS)
+    except Exception as e:
+        # No database (e.g. used outside the API): run uncached
+        logger.debug(f"OCR cache lookup failed for {image_url}: {e}")
+        return None
 
-    for image_url in image_urls[:max_images]:
-        try:
-            resp = requests.get(image_url, timeout=15)
+
+def _ocr_cache_put(image_url: str, text: str, etag: Optional[str], last_modified: Optional[str]):
+    try:
+        OcrCacheRepository.put(image_url, text, etag, last_modified)
+    except Exception as e:
+        logger.debug(f"OCR cache store failed for {image_url}: {e}")
+
+
+def _ocr_image_url(image_url: str) -> str:
+    """Download and OCR a single image. Returns "" if skipped or no text found."""
+    text = _ocr_image_url_text(image_url)
+    return f"[IMAGE_URL: {image_url}]\n{text}" if text else ""
+
+
+def _ocr_image_url_text(image_url: str) -> str:
+    """
+    OCR text for one image URL, served from the OCR cache when the image is
+    unchanged (304 on revalidation). Returns "" if skipped or no text found.
+    """
+    cached = _ocr_cache_get(image_url)
+    headers = {}
+    if cached:
+        if cached["etag"] or cached["last_modified"]:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+        elif cached["fresh"]:
+            return cached["text"]
+
+    try:
+        with _image_session.get(image_url, timeout=15, stream=True, headers=headers) as resp:
+            if resp.status_code == 304 and cached:
+                return cached["text"]
             if resp.status_code != 200:
                 logger.debug(f"Could not fetch image: {image_url} (status {resp.status_code})")
-                continue
+                return ""
 
             ctype = resp.headers.get("Content-Type", "").lower()
+            if ctype and not ctype.startswith(_IMAGE_CONTENT_TYPES):
+                logger.debug(f"Skipping non-image response ({ctype}): {image_url}")
+                return ""
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+            body = _read_capped(resp, MAX_IMAGE_BYTES)
+
+        if body is None:
+            logger.debug(f"Skipping image larger than {MAX_IMAGE_BYTES} bytes: {image_url}")
+            return ""
+
+        # Handle SVG
+        if "svg" in ctype:
+            try:
+                from cairosvg import svg2png
+                png_data = svg2png(bytestring=body)
+                image = Image.open(BytesIO(png_data))
+            except ImportError:
+                logger.debug(f"cairosvg not available, skipping SVG: {image_url}")
+                return ""
+        else:
+            image = Image.open(BytesIO(body))
+
+        # Skip very small images (likely icons/decorations)
+        width, height = image.size
+        if width < 50 or height < 50:
+            _ocr_cache_put(image_url, "", etag, last_modified)
+            return ""
+
+        if image.format == "JPEG":
+            # OCR works on luminance anyway; draft mode lets libjpeg decode
+            # straight to grayscale, skipping the RGB buffer and conversion.
+            # Full resolution is kept so small text stays readable.
+            image.draft("L", image.size)
+            image = image.convert("L")
+
+        text = (_ocr_image(image) or "").strip()
+        # An empty result without an OCR engine says nothing about the image
+        if text or _get_ocr_engine()[0] != "none":
+            _ocr_cache_put(image_url, text, etag, last_modified)
+        return text
 
-            # Handle SVG
-            if "svg" in ctype:
-                try:
-                    from cairosvg import svg2png
-                    png_data = svg2png(bytestring=resp.content)
-                    image = Image.open(BytesIO(png_data))
-                except ImportError:
-                    logger.debug(f"cairosvg not available, skipping SVG: {image_url}")
-                    continue
-            else:
-                image = Image.open(BytesIO(resp.content))
-
-            # Skip very small images (likely icons/decorations)
-            width, height = image.size
-            if width < 50 or height < 50:
-                continue
-
-            text = _ocr_image(image)
-            if text and text.strip():
-                extracted = f"[IMAGE_URL: {image_url}]\n{text.strip()}"
-                all_text.append(extracted)
-                processed += 1
-
-        except Exception as e:
-            logger.debug(f"Error processing image {image_url}: {e}")
-
-    logger.info(f"OCR processed {processed}/{len(image_urls[:max_images])} images")
+    except Exception as e:
+        logger.debug(f"Error processing image {image_url}: {e}")
+    return ""
+
+
+def extract_text_from_images(image_urls: List[str], max_images: int = 30) -> str:
+    """
+    Extract text from a list of image URLs using OCR.
+    Images are fetched and processed on a thread pool (downloads and the
+    Tesseract subprocess both release the GIL); output keeps input order.
+    """
+    urls = image_urls[:max_images]
+    all_text = []
+    if urls:
+        with ThreadPoolExecutor(max_workers=min(OCR_WORKERS, len(urls))) as executor:
+            all_text = [text for text in executor.map(_ocr_image_url, urls) if text]
+
+    logger.info(f"OCR processed {len(all_text)}/{len(urls)} images")
     return "\n\n".join(all_text)
 
 
 # ─── PDF Processing ──────────────────────────────────────────────────────────
 
+def _read_pdf_pages(parts: List[str], pdf_path: Optional[str] = None,
+                    pdf_bytes: Optional[bytes] = None) -> int:
+    """
+    Append each page's text (newline-terminated) to `parts` and return the
+    page count. Uses PyMuPDF's C text extractor when installed, else PyPDF2.
+    Pages read before an error stay in `parts`.
+    """
+    if pymupdf is not None:
+        if pdf_bytes is None:
+            doc = pymupdf.open(pdf_path)
+        else:
+            doc = pymupdf.open(stream=pdf_bytes, filetype="pdf")
+        with doc:
+            for page in doc:
+                page_text = page.get_text("text")
+                if page_text:
+                    # MuPDF already ends each line, including the last, with \n
+                    parts.append(page_text if page_text.endswith("\n") else page_text + "\n")
+            return doc.page_count
+
+    reader = PdfReader(pdf_path if pdf_bytes is None else BytesIO(pdf_bytes))
+    for page in reader.pages:
+        page_text = page.extract_text()
+        if page_text:
+            parts.append(page_text + "\n")
+    return len(reader.pages)
+
+
 def extract_text_from_pdf(pdf_path: str) -> str:
     """Extract text from a local PDF file."""
-    text = ""
+    parts = []
     try:
-        reader = PdfReader(pdf_path)
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        logger.info(f"Extracted text from PDF: {pdf_path} ({len(reader.pages)} pages)")
+        page_count = _read_pdf_pages(parts, pdf_path=pdf_path)
+        logger.info(f"Extracted text from PDF: {pdf_path} ({page_count} pages)")
     except Exception as e:
         logger.error(f"Error processing PDF {pdf_path}: {e}")
-    return text
+    return "".join(parts)
 
 
 def extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
     """Extract text from PDF bytes (for upload support)."""
-    text = ""
+    parts = []
     try:
-        reader = PdfReader(BytesIO(pdf_bytes))
-        for page in reader.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-        logger.info(f"Extracted text from PDF upload ({len(reader.pages)} pages)")
+        page_count = _read_pdf_pages(parts, pdf_bytes=pdf_bytes)
+        logger.info(f"Extracted text from PDF upload ({page_count} pages)")
     except Exception as e:
         logger.error(f"Error processing PDF bytes: {e}")
-    return text
+    return "".join(parts)
@@ -3,19 +3,30 @@ PERSEPTOR v2.0 - Database Layer
 SQLite-based persistence for reports, rules, sessions, and token usage.
 """
 
-from modules.database.models import init_db, get_db_connection
+from modules.database.models import (
+    init_db,
+    get_db_connection,
+    get_read_connection,
+    get_readonly_connection,
+    get_write_connection,
+)
 from modules.database.repository import (
     ReportRepository,
     RuleRepository,
     SessionRepository,
     TokenUsageRepository,
+    OcrCacheRepository,
 )
 
 __all__ = [
     "init_db",
     "get_db_connection",
+    "get_read_connection",
+    "get_readonly_connection",
+    "get_write_connection",
     "ReportRepository",
     "RuleRepository",
     "SessionRepository",
     "TokenUsageRepository",
+    "OcrCacheRepository",
 ]
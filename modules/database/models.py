@@ -5,6 +5,12 @@ SQLite database initialization with WAL mode for concurrent access.
 
 import sqlite3
 import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, Optional
 from modules.config import config
 from modules.logging_config import get_logger
 
@@ -12,6 +18,21 @@ logger = get_logger("database")
 
 _DB_PATH = None
 
+# Connection pool: one shared writer (SQLite serializes writers anyway)
+# plus a bounded set of reusable reader connections.
+_write_conn: Optional[sqlite3.Connection] = None
+_write_lock = threading.Lock()
+_read_pool: "queue.Queue[sqlite3.Connection]" = queue.Queue(maxsize=os.cpu_count() or 4)
+
+# Background maintenance: refresh planner stats and bound WAL growth
+_MAINTENANCE_INTERVAL = 900  # seconds
+_WAL_TRUNCATE_BYTES = 64 * 1024 * 1024
+_maintenance_thread: Optional[threading.Thread] = None
+
+# init_db() runs schema setup/migrations once per process
+_initialized = False
+_init_lock = threading.Lock()
+
 
 def _get_db_path() -> str:
     global _DB_PATH
@@ -20,21 +41,186 @@ def _get_db_path() -> str:
     return _DB_PATH
 
 
-def get_db_connection() -> sqlite3.Connection:
-    """Get a new database connection with optimal settings."""
-    db_path = _get_db_path()
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-
-    conn = sqlite3.connect(db_path, timeout=config.database.busy_timeout / 1000)
+def _open_connection(target: str, uri: bool = False) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        target,
+        uri=uri,
+        timeout=config.database.busy_timeout / 1000,
+        check_same_thread=False,
+        # Pooled connections live long; keep every repository query prepared
+        cached_statements=256,
+    )
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA journal_mode=WAL")
     conn.execute("PRAGMA foreign_keys=ON")
     conn.execute("PRAGMA busy_timeout=5000")
+    # WAL + NORMAL syncs on checkpoint rather than on every commit
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    conn.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
     return conn
 
 
+def get_db_connection() -> sqlite3.Connection:
+    """Get a new database connection with optimal settings."""
+    db_path = _get_db_path()
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    return _open_connection(db_path)
+
+
+def get_readonly_connection() -> sqlite3.Connection:
+    """
+    Get a new read-only connection (SQLite URI mode=ro).
+
+    Read-only connections never take part in writer locking. The database must
+    already exist, i.e. init_db() has run.
+    """
+    uri = Path(os.path.abspath(_get_db_path())).as_uri() + "?mode=ro"
+    return _open_connection(uri, uri=True)
+
+
+@contextmanager
+def get_write_connection() -> Iterator[sqlite3.Connection]:
+    """
+    Borrow the shared writer connection inside a write transaction.
+
+    The transaction is opened with BEGIN IMMEDIATE so the write lock is taken
+    up front instead of being upgraded mid-transaction (which can stall on
+    SQLITE_BUSY). Commits on success, rolls back if the block raises.
+    """
+    global _write_conn
+    with _write_lock:
+        if _write_conn is None:
+            _write_conn = get_db_connection()
+            _write_conn.isolation_level = None  # manage transactions explicitly
+        conn = _write_conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+
+@contextmanager
+def get_read_connection() -> Iterator[sqlite3.Connection]:
+    """Borrow a pooled read-only connection, creating one if the pool is empty."""
+    try:
+        conn = _read_pool.get_nowait()
+    except queue.Empty:
+        conn = get_readonly_connection()
+    try:
+        yield conn
+    finally:
+        try:
+            _read_pool.put_nowait(conn)
+        except queue.Full:
+            _close_connection(conn)
+
+
+def _close_connection(conn: sqlite3.Connection):
+    """Close a connection, letting SQLite refresh planner stats first as it recommends."""
+    try:
+        conn.execute("PRAGMA optimize")
+    except sqlite3.Error:
+        pass
+    conn.close()
+
+
+def _run_maintenance(conn: sqlite3.Connection):
+    """Refresh query planner stats and truncate the WAL once it grows large."""
+    conn.execute("PRAGMA optimize")
+    try:
+        wal_size = os.path.getsize(_get_db_path() + "-wal")
+    except OSError:
+        return
+    if wal_size > _WAL_TRUNCATE_BYTES:
+        # Hold the writer lock so our own writes don't race the checkpoint
+        with _write_lock:
+            busy, _, _ = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        logger.info(f"WAL checkpoint (TRUNCATE) at {wal_size} bytes, busy={busy}")
+
+
+def _maintenance_loop():
+    conn = get_db_connection()
+    while True:
+        time.sleep(_MAINTENANCE_INTERVAL)
+        try:
+            _run_maintenance(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Database maintenance failed: {e}")
+
+
+def _start_maintenance():
+    global _maintenance_thread
+    if _maintenance_thread is None:
+        _maintenance_thread = threading.Thread(
+            target=_maintenance_loop, name="db-maintenance", daemon=True
+        )
+        _maintenance_thread.start()
+
+
+SCHEMA_VERSION = 2
+
+# Small, keyed-by-id rows: stored directly in the primary key b-tree
+# (WITHOUT ROWID) instead of a rowid table plus a separate PK index.
+_USER_SESSIONS_DDL = """
+    CREATE TABLE IF NOT EXISTS {name} (
+        id TEXT PRIMARY KEY,
+        session_token TEXT UNIQUE NOT NULL,
+        provider TEXT NOT NULL,
+        encrypted_api_key TEXT NOT NULL,
+        model_preference TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        expires_at TIMESTAMP NOT NULL,
+        last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID
+"""
+
+
+def _migrate_sessions_without_rowid(conn: sqlite3.Connection):
+    """Schema v2: rebuild an existing rowid user_sessions table as WITHOUT ROWID."""
+    conn.commit()
+    # Dropping the old table must not fire ON DELETE SET NULL on token_usage
+    conn.execute("PRAGMA foreign_keys=OFF")
+    try:
+        conn.execute("BEGIN")
+        conn.execute(_USER_SESSIONS_DDL.format(name="user_sessions_new"))
+        conn.execute("""
+            INSERT INTO user_sessions_new
+                (id, session_token, provider, encrypted_api_key, model_preference,
+                 created_at, expires_at, last_used)
+            SELECT id, session_token, provider, encrypted_api_key, model_preference,
+                   created_at, expires_at, last_used
+            FROM user_sessions
+        """)
+        conn.execute("DROP TABLE user_sessions")
+        conn.execute("ALTER TABLE user_sessions_new RENAME TO user_sessions")
+        conn.commit()
+        logger.info("Migrated user_sessions to WITHOUT ROWID (schema v2)")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.execute("PRAGMA foreign_keys=ON")
+
+
 def init_db():
-    """Initialize database schema. Safe to call multiple times."""
+    """Initialize database schema. Safe to call multiple times; only the first call does work."""
+    global _initialized
+    if _initialized:
+        return
+    with _init_lock:
+        if _initialized:
+            return
+        _create_schema()
+        _start_maintenance()
+        _initialized = True
+
+
+def _create_schema():
     conn = get_db_connection()
     try:
         cursor = conn.cursor()
@@ -46,6 +232,9 @@ def init_db():
                 applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             )
         """)
+        current_version = cursor.execute(
+            "SELECT COALESCE(MAX(version), 0) FROM schema_version"
+        ).fetchone()[0]
 
         # Analysis Reports
         cursor.execute("""
@@ -101,18 +290,9 @@ def init_db():
         """)
 
         # User Sessions
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS user_sessions (
-                id TEXT PRIMARY KEY,
-                session_token TEXT UNIQUE NOT NULL,
-                provider TEXT NOT NULL,
-                encrypted_api_key TEXT NOT NULL,
-                model_preference TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                expires_at TIMESTAMP NOT NULL,
-                last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
+        cursor.execute(_USER_SESSIONS_DDL.format(name="user_sessions"))
+        if 0 < current_version < 2:
+            _migrate_sessions_without_rowid(conn)
 
         # Token Usage Tracking
         cursor.execute("""
@@ -131,18 +311,41 @@ def init_db():
             )
         """)
 
+        # OCR results per image URL, revalidated with the stored ETag/Last-Modified
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ocr_cache (
+                url_hash BLOB PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                text TEXT NOT NULL,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID
+        """)
+
         # Indexes for performance
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_timestamp ON analysis_reports(timestamp)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_url ON analysis_reports(url)")
+        # URL history lookups: (url, timestamp DESC) serves both the filter and
+        # the ordering, so the old single-column url index is redundant.
+        cursor.execute("DROP INDEX IF EXISTS idx_reports_url")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_reports_url_ts ON analysis_reports(url, timestamp DESC)"
+        )
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_rules_product ON generated_rules(product)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_rules_created ON generated_rules(created_at)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_token ON user_sessions(session_token)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON user_sessions(expires_at)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_usage_session ON token_usage(session_id)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_usage_timestamp ON token_usage(timestamp)")
+        # Lets get_usage_by_provider's GROUP BY provider, model walk index order
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_usage_pms ON token_usage(provider, model, session_id)"
+        )
 
         # Record schema version
-        cursor.execute("INSERT OR IGNORE INTO schema_version (version) VALUES (1)")
+        cursor.executemany(
+            "INSERT OR IGNORE INTO schema_version (version) VALUES (?)",
+            [(v,) for v in range(1, SCHEMA_VERSION + 1)],
+        )
 
         conn.commit()
         logger.info(f"Database initialized at: {_get_db_path()}")
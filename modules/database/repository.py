@@ -3,33 +3,132 @@ PERSEPTOR v2.0 - Data Access Repositories
 Clean separation of database operations with parameterized queries.
 """
 
+import atexit
+import hashlib
 import json
+import queue
+import sqlite3
+import sys
+import threading
+import time
 import uuid
-from datetime import datetime
-from typing import List, Optional, Dict, Any
-from modules.database.models import get_db_connection
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Iterator, Union
+from modules.database.models import get_read_connection, get_write_connection
 from modules.logging_config import get_logger
 
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # optional, large JSON blobs are stored uncompressed
+    zstandard = None
+
 logger = get_logger("database.repository")
 
+# UPDATE ... RETURNING needs SQLite 3.35+
+_HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+
+# json.dumps() builds a fresh JSONEncoder whenever non-default kwargs are
+# passed; reuse one configured encoder instead.
+_json_encode = json.JSONEncoder(ensure_ascii=False, default=str).encode
+_ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson is not None else 0
+
+
+# JSON blobs above this size are zstd-compressed. Compressed values are told
+# apart by the zstd frame magic, which can never start a JSON document.
+_COMPRESS_MIN_BYTES = 512
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+_zstd_local = threading.local()  # zstandard (de)compressors aren't thread-safe
+
+
+def _compress(payload: bytes) -> bytes:
+    if zstandard is None or len(payload) <= _COMPRESS_MIN_BYTES:
+        return payload
+    cctx = getattr(_zstd_local, "cctx", None)
+    if cctx is None:
+        cctx = _zstd_local.cctx = zstandard.ZstdCompressor(level=3)
+    return cctx.compress(payload)
+
+
+def _decompress(data: bytes) -> Optional[bytes]:
+    if zstandard is None:
+        logger.warning("Compressed column found but zstandard is not installed")
+        return None
+    dctx = getattr(_zstd_local, "dctx", None)
+    if dctx is None:
+        dctx = _zstd_local.dctx = zstandard.ZstdDecompressor()
+    return dctx.decompress(data)
+
+
+def _serialize(obj) -> Union[str, bytes]:
+    """
+    Serialize object to JSON for storage.
 
-def _serialize(obj) -> str:
-    """Serialize object to JSON string for storage."""
+    Encoded objects are returned as UTF-8 bytes, which SQLite stores as a BLOB
+    (TEXT affinity never converts BLOBs), so reads skip SQLite's text decoding.
+    Large payloads are zstd-compressed when zstandard is available. Strings are
+    stored as-is.
+    """
     if obj is None:
         return "{}"
     if isinstance(obj, str):
         return obj
-    return json.dumps(obj, ensure_ascii=False, default=str)
-
-
-def _deserialize(json_str: str) -> Any:
-    """Deserialize JSON string from storage."""
-    if not json_str:
+    payload = None
+    if orjson is not None:
+        try:
+            # default=str is only invoked for types orjson can't encode natively
+            payload = orjson.dumps(obj, default=str, option=_ORJSON_OPTIONS)
+        except TypeError:
+            pass  # e.g. integers beyond 64 bits; let stdlib handle it
+    if payload is None:
+        payload = _json_encode(obj).encode("utf-8")
+    return _compress(payload)
+
+
+def _deserialize(data: Union[str, bytes, None]) -> Any:
+    """Deserialize JSON from storage. Accepts compressed/plain BLOBs and legacy TEXT."""
+    if not data:
         return {}
+    if isinstance(data, bytes) and data.startswith(_ZSTD_MAGIC):
+        data = _decompress(data)
+        if data is None:
+            return {}
     try:
-        return json.loads(json_str)
-    except (json.JSONDecodeError, TypeError):
-        return json_str
+        if orjson is not None:
+            return orjson.loads(data)
+        return json.loads(data)
+    except (ValueError, TypeError):
+        return data.decode("utf-8", "replace") if isinstance(data, bytes) else data
+
+
+# Columns holding serialized JSON, decoded after a single dict(row) copy.
+# atomic_tests/mitre_mapping were added by ALTER TABLE, hence .get() for reports.
+_REPORT_JSON_COLUMNS = (
+    "analysis_data", "yara_rules", "siem_queries", "sigma_matches",
+    "atomic_tests", "mitre_mapping",
+)
+_RULE_JSON_COLUMNS = (
+    "rule_content", "mitre_techniques", "test_cases", "recommendations",
+    "component_scores",
+)
+
+
+# Low-cardinality string columns ("openai", "gpt-4o", "PERSEPTOR", ...) that
+# are interned so every row shares one str object per distinct value.
+_INTERNED_COLUMNS = ("provider", "model", "author")
+
+
+def _intern_columns(result: Dict) -> Dict:
+    for key in _INTERNED_COLUMNS:
+        value = result.get(key)
+        if isinstance(value, str):
+            result[key] = sys.intern(value)
+    return result
 
 
 class ReportRepository:
@@ -38,9 +137,8 @@ class ReportRepository:
     @staticmethod
     def create(report_data: Dict) -> str:
         """Save a new analysis report. Returns the report ID."""
-        report_id = report_data.get("id", str(uuid.uuid4()))
-        conn = get_db_connection()
-        try:
+        report_id = report_data.get("id", uuid.uuid4().hex)
+        with get_write_connection() as conn:
             conn.execute(
                 """INSERT INTO analysis_reports
                    (id, url, timestamp, threat_summary, analysis_data, yara_rules,
@@ -63,205 +161,157 @@ class ReportRepository:
                     report_data.get("model"),
                 ),
             )
-            conn.commit()
             logger.info(f"Report saved: {report_id}")
-            return report_id
-        finally:
-            conn.close()
+        return report_id
 
     @staticmethod
     def get_by_id(report_id: str) -> Optional[Dict]:
         """Get a report by ID."""
-        conn = get_db_connection()
-        try:
+        with get_read_connection() as conn:
             row = conn.execute(
                 "SELECT * FROM analysis_reports WHERE id = ?", (report_id,)
             ).fetchone()
             if row:
                 return ReportRepository._row_to_dict(row)
             return None
-        finally:
-            conn.close()
 
     @staticmethod
     def list_all(limit: int = 100, offset: int = 0) -> List[Dict]:
         """List all reports, newest first."""
-        conn = get_db_connection()
-        try:
-            rows = conn.execute(
+        return list(ReportRepository.iter_all(limit, offset))
+
+    @staticmethod
+    def iter_all(limit: int = 100, offset: int = 0) -> Iterator[Dict]:
+        """Yield reports, newest first, decoding each row only as it is consumed."""
+        with get_read_connection() as conn:
+            cursor = conn.execute(
                 "SELECT * FROM analysis_reports ORDER BY timestamp DESC LIMIT ? OFFSET ?",
                 (limit, offset),
-            ).fetchall()
-            return [ReportRepository._row_to_dict(r) for r in rows]
-        finally:
-            conn.close()
+            )
+            for row in cursor:
+                yield ReportRepository._row_to_dict(row)
 
     @staticmethod
     def delete(report_id: str) -> bool:
         """Delete a report. Returns True if deleted."""
-        conn = get_db_connection()
-        try:
+        with get_write_connection() as conn:
             result = conn.execute(
                 "DELETE FROM analysis_reports WHERE id = ?", (report_id,)
             )
-            conn.commit()
             deleted = result.rowcount > 0
-            if deleted:
-                logger.info(f"Report deleted: {report_id}")
+        if deleted:
+            logger.info(f"Report deleted: {report_id}")
             return deleted
-        finally:
-            conn.close()
 
     @staticmethod
     def count() -> int:
         """Count total reports."""
-        conn = get_db_connection()
-        try:
+        with get_read_connection() as conn:
             row = conn.execute("SELECT COUNT(*) as cnt FROM analysis_reports").fetchone()
             return row["cnt"]
-        finally:
-            conn.close()
 
     @staticmethod
     def _row_to_dict(row) -> Dict:
-        result = {
-            "id": row["id"],
-            "url": row["url"],
-            "timestamp": row["timestamp"],
-            "threat_summary": row["threat_summary"],
-            "analysis_data": _deserialize(row["analysis_data"]),
-            "yara_rules": _deserialize(row["yara_rules"]),
-            "generated_sigma_rules": row["generated_sigma_rules"],
-            "siem_queries": _deserialize(row["siem_queries"]),
-            "sigma_matches": _deserialize(row["sigma_matches"]),
-            "provider": row["provider"],
-            "model": row["model"],
-        }
-        # Added in schema v2 — handle older rows that may not have these columns
-        try:
-            result["atomic_tests"] = _deserialize(row["atomic_tests"])
-        except (IndexError, KeyError):
-            result["atomic_tests"] = []
-        try:
-            result["mitre_mapping"] = _deserialize(row["mitre_mapping"])
-        except (IndexError, KeyError):
-            result["mitre_mapping"] = {}
-        return result
+        result = dict(row)
+        for key in _REPORT_JSON_COLUMNS:
+            result[key] = _deserialize(result.get(key))
+        return _intern_columns(result)
 
 
 class RuleRepository:
     """Data access for generated rules."""
 
-    @staticmethod
-    def create(rule_data: Dict) -> str:
-        """Save a new generated rule. Returns the rule ID."""
-        rule_id = rule_data.get("id", str(uuid.uuid4()))
-        conn = get_db_connection()
-        try:
-            conn.execute(
-                """INSERT INTO generated_rules
+    _INSERT_SQL = """INSERT INTO generated_rules
                    (id, title, description, author, date, product, confidence_score,
                     rule_content, mitre_techniques, test_cases, recommendations,
                     references_data, explanation, component_scores, provider, model)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    rule_id,
-                    rule_data.get("title", "Untitled Rule"),
-                    rule_data.get("description", ""),
-                    rule_data.get("author", "PERSEPTOR"),
-                    rule_data.get("date", datetime.now().strftime("%Y/%m/%d")),
-                    rule_data.get("product", "sigma"),
-                    rule_data.get("confidence_score", 0.0),
-                    _serialize(rule_data.get("rule_content")),
-                    _serialize(rule_data.get("mitre_techniques")),
-                    _serialize(rule_data.get("test_cases")),
-                    _serialize(rule_data.get("recommendations")),
-                    _serialize(rule_data.get("references")),
-                    rule_data.get("explanation", ""),
-                    _serialize(rule_data.get("component_scores")),
-                    rule_data.get("provider", "openai"),
-                    rule_data.get("model"),
-                ),
-            )
-            conn.commit()
-            logger.info(f"Rule saved: {rule_id} - {rule_data.get('title')}")
-            return rule_id
-        finally:
-            conn.close()
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+    @staticmethod
+    def create(rule_data: Dict) -> str:
+        """Save a new generated rule. Returns the rule ID."""
+        params = RuleRepository._to_params(rule_data)
+        with get_write_connection() as conn:
+            conn.execute(RuleRepository._INSERT_SQL, params)
+            logger.info(f"Rule saved: {params[0]} - {rule_data.get('title')}")
+        return params[0]
+
+    @staticmethod
+    def _to_params(rule_data: Dict) -> tuple:
+        return (
+            rule_data.get("id", uuid.uuid4().hex),
+            rule_data.get("title", "Untitled Rule"),
+            rule_data.get("description", ""),
+            rule_data.get("author", "PERSEPTOR"),
+            rule_data.get("date", datetime.now().strftime("%Y/%m/%d")),
+            rule_data.get("product", "sigma"),
+            rule_data.get("confidence_score", 0.0),
+            _serialize(rule_data.get("rule_content")),
+            _serialize(rule_data.get("mitre_techniques")),
+            _serialize(rule_data.get("test_cases")),
+            _serialize(rule_data.get("recommendations")),
+            _serialize(rule_data.get("references")),
+            rule_data.get("explanation", ""),
+            _serialize(rule_data.get("component_scores")),
+            rule_data.get("provider", "openai"),
+            rule_data.get("model"),
+        )
 
     @staticmethod
     def get_by_id(rule_id: str) -> Optional[Dict]:
         """Get a rule by ID."""
-        conn = get_db_connection()
-        try:
+        with get_read_connection() as conn:
             row = conn.execute(
                 "SELECT * FROM generated_rules WHERE id = ?", (rule_id,)
             ).fetchone()
             if row:
                 return RuleRepository._row_to_dict(row)
             return None
-        finally:
-            conn.close()
 
     @staticmethod
     def list_all(limit: int = 100, offset: int = 0) -> List[Dict]:
         """List all rules, newest first."""
-        conn = get_db_connection()
-        try:
-            rows = conn.execute(
+        return list(RuleRepository.iter_all(limit, offset))
+
+    @staticmethod
+    def iter_all(limit: int = 100, offset: int = 0) -> Iterator[Dict]:
+        """Yield rules, newest first, decoding each row only as it is consumed."""
+        with get_read_connection() as conn:
+            cursor = conn.execute(
                 "SELECT * FROM generated_rules ORDER BY created_at DESC LIMIT ? OFFSET ?",
                 (limit, offset),
-            ).fetchall()
-            return [RuleRepository._row_to_dict(r) for r in rows]
-        finally:
-            conn.close()
+            )
+            for row in cursor:
+                yield RuleRepository._row_to_dict(row)
 
     @staticmethod
     def delete(rule_id: str) -> bool:
         """Delete a rule. Returns True if deleted."""
-        conn = get_db_connection()
-        try:
+        with get_write_connection() as conn:
             result = conn.execute(
                 "DELETE FROM generated_rules WHERE id = ?", (rule_id,)
             )
-            conn.commit()
             deleted = result.rowcount > 0
-            if deleted:
-                logger.info(f"Rule deleted: {rule_id}")
+        if deleted:
+            logger.info(f"Rule deleted: {rule_id}")
             return deleted
-        finally:
-            conn.close()
 
     @staticmethod
     def count() -> int:
-        conn = get_db_connection()
-        try:
+        with get_read_connection() as conn:
             row = conn.execute("SELECT COUNT(*) as cnt FROM generated_rules").fetchone()
             return row["cnt"]
-        finally:
-            conn.close()
 
     @staticmethod
     def _row_to_dict(row) -> Dict:
-        return {
-            "id": row["id"],
-            "title": row["title"],
-            "description": row["description"],
-            "author": row["author"],
-            "date": row["date"],
-            "product": row["product"],
-            "confidence_score": row["confidence_score"],
-            "rule_content": _deserialize(row["rule_content"]),
-            "mitre_techniques": _deserialize(row["mitre_techniques"]),
-            "test_cases": _deserialize(row["test_cases"]),
-            "recommendations": _deserialize(row["recommendations"]),
-            "references": _deserialize(row["references_data"]),
-            "explanation": row["explanation"],
-            "component_scores": _deserialize(row["component_scores"]),
-            "provider": row["provider"],
-            "model": row["model"],
-            "created_at": row["created_at"],
-        }
+        result = dict(row)
+        for key in _RULE_JSON_COLUMNS:
+            result[key] = _deserialize(result[key])
+        result["references"] = _deserialize(result.pop("references_data"))
+        return _intern_columns(result)
+
+
+_CLEANUP_BATCH_SIZE = 500
 
 
 class SessionRepository:
@@ -270,9 +320,8 @@ class SessionRepository:
     @staticmethod
     def create(session_data: Dict) -> str:
         """Create a new session. Returns session ID."""
-        session_id = str(uuid.uuid4())
-        conn = get_db_connection()
-        try:
+        session_id = uuid.uuid4().hex
+        with get_write_connection() as conn:
             conn.execute(
                 """INSERT INTO user_sessions
                    (id, session_token, provider, encrypted_api_key, model_preference, expires_at)
@@ -286,70 +335,110 @@ class SessionRepository:
                     session_data["expires_at"],
                 ),
             )
-            conn.commit()
             logger.info(f"Session created: {session_id}")
             return session_id
-        finally:
-            conn.close()
 
     @staticmethod
     def get_by_token(session_token: str) -> Optional[Dict]:
-        """Get session by token."""
-        conn = get_db_connection()
-        try:
+        """Get session by token, touching its last_used timestamp."""
+        if _HAS_RETURNING:
+            with get_write_connection() as conn:
+                row = conn.execute(
+                    """UPDATE user_sessions SET last_used = datetime('now')
+                       WHERE session_token = ? AND expires_at > datetime('now')
+                       RETURNING *""",
+                    (session_token,),
+                ).fetchone()
+            return dict(row) if row else None
+
+        with get_read_connection() as conn:
             row = conn.execute(
                 "SELECT * FROM user_sessions WHERE session_token = ? AND expires_at > datetime('now')",
                 (session_token,),
             ).fetchone()
-            if row:
-                # Update last_used
-                conn.execute(
-                    "UPDATE user_sessions SET last_used = datetime('now') WHERE id = ?",
-                    (row["id"],),
-                )
-                conn.commit()
-                return dict(row)
+        if not row:
             return None
-        finally:
-            conn.close()
+
+        # Update last_used in a separate short write transaction
+        with get_write_connection() as conn:
+            conn.execute(
+                "UPDATE user_sessions SET last_used = datetime('now') WHERE id = ?",
+                (row["id"],),
+            )
+        return dict(row)
 
     @staticmethod
     def delete(session_id: str) -> bool:
-        conn = get_db_connection()
-        try:
+        with get_write_connection() as conn:
             result = conn.execute(
                 "DELETE FROM user_sessions WHERE id = ?", (session_id,)
             )
-            conn.commit()
             return result.rowcount > 0
-        finally:
-            conn.close()
 
     @staticmethod
     def delete_by_token(session_token: str) -> bool:
-        conn = get_db_connection()
-        try:
+        with get_write_connection() as conn:
             result = conn.execute(
                 "DELETE FROM user_sessions WHERE session_token = ?", (session_token,)
             )
-            conn.commit()
             return result.rowcount > 0
-        finally:
-            conn.close()
 
     @staticmethod
     def cleanup_expired():
-        """Remove expired sessions."""
-        conn = get_db_connection()
+        """Remove expired sessions in small batches so other writers aren't starved."""
+        removed = 0
+        while True:
+            # Each batch is its own short transaction, releasing the write lock in between
+            with get_write_connection() as conn:
+                deleted = conn.execute(
+                    """DELETE FROM user_sessions WHERE id IN (
+                           SELECT id FROM user_sessions
+                           WHERE expires_at < datetime('now') LIMIT ?
+                       )""",
+                    (_CLEANUP_BATCH_SIZE,),
+                ).rowcount
+            removed += deleted
+            if deleted < _CLEANUP_BATCH_SIZE:
+                break
+        if removed > 0:
+            logger.info(f"Cleaned up {removed} expired sessions")
+
+
+# Token usage rows are buffered in memory and written in batches by a
+# background thread, so an LLM call never waits on a commit.
+_USAGE_BATCH_SIZE = 500
+_USAGE_FLUSH_INTERVAL = 0.2  # seconds
+_usage_queue: "queue.Queue[tuple]" = queue.Queue()
+_usage_pending = threading.Event()
+_usage_flush_lock = threading.Lock()
+_usage_thread: Optional[threading.Thread] = None
+_usage_thread_lock = threading.Lock()
+
+
+def _usage_flush_loop():
+    """Background writer: wait for queued rows, batch briefly, then flush."""
+    while True:
+        _usage_pending.wait()
+        if _usage_queue.qsize() < _USAGE_BATCH_SIZE:
+            time.sleep(_USAGE_FLUSH_INTERVAL)
+        _usage_pending.clear()
         try:
-            result = conn.execute(
-                "DELETE FROM user_sessions WHERE expires_at < datetime('now')"
+            TokenUsageRepository.flush()
+        except Exception as e:
+            logger.error(f"Token usage flush failed: {e}")
+
+
+def _ensure_usage_writer():
+    global _usage_thread
+    if _usage_thread is not None:
+        return
+    with _usage_thread_lock:
+        if _usage_thread is None:
+            _usage_thread = threading.Thread(
+                target=_usage_flush_loop, name="token-usage-writer", daemon=True
             )
-            conn.commit()
-            if result.rowcount > 0:
-                logger.info(f"Cleaned up {result.rowcount} expired sessions")
-        finally:
-            conn.close()
+            _usage_thread.start()
+            atexit.register(TokenUsageRepository.flush)
 
 
 class TokenUsageRepository:
@@ -357,34 +446,48 @@ class TokenUsageRepository:
 
     @staticmethod
     def record(usage_data: Dict):
-        """Record a token usage entry."""
-        conn = get_db_connection()
-        try:
-            conn.execute(
-                """INSERT INTO token_usage
-                   (session_id, provider, model, prompt_tokens, completion_tokens,
-                    total_tokens, endpoint, latency_ms)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-                (
-                    usage_data.get("session_id"),
-                    usage_data.get("provider", "unknown"),
-                    usage_data.get("model", "unknown"),
-                    usage_data.get("prompt_tokens", 0),
-                    usage_data.get("completion_tokens", 0),
-                    usage_data.get("total_tokens", 0),
-                    usage_data.get("endpoint"),
-                    usage_data.get("latency_ms", 0),
-                ),
-            )
-            conn.commit()
-        finally:
-            conn.close()
+        """Queue a token usage entry. Written to the database in the background."""
+        _ensure_usage_writer()
+        _usage_queue.put((
+            usage_data.get("session_id"),
+            usage_data.get("provider", "unknown"),
+            usage_data.get("model", "unknown"),
+            usage_data.get("prompt_tokens", 0),
+            usage_data.get("completion_tokens", 0),
+            usage_data.get("total_tokens", 0),
+            usage_data.get("endpoint"),
+            usage_data.get("latency_ms", 0),
+            datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        ))
+        _usage_pending.set()
+
+    @staticmethod
+    def flush() -> int:
+        """Write all queued usage entries in a single transaction. Returns rows written."""
+        with _usage_flush_lock:
+            rows = []
+            while True:
+                try:
+                    rows.append(_usage_queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not rows:
+                return 0
+            with get_write_connection() as conn:
+                conn.executemany(
+                    """INSERT INTO token_usage
+                       (session_id, provider, model, prompt_tokens, completion_tokens,
+                        total_tokens, endpoint, latency_ms, timestamp)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+                    rows,
+                )
+            return len(rows)
 
     @staticmethod
     def get_usage_summary(session_id: Optional[str] = None) -> Dict:
         """Get aggregated usage statistics."""
-        conn = get_db_connection()
-        try:
+        TokenUsageRepository.flush()
+        with get_read_connection() as conn:
             if session_id:
                 row = conn.execute(
                     """SELECT
@@ -414,14 +517,12 @@ class TokenUsageRepository:
                 "total_tokens": row["total_tokens"] or 0,
                 "avg_latency_ms": round(row["avg_latency_ms"] or 0, 1),
             }
-        finally:
-            conn.close()
 
     @staticmethod
     def get_usage_by_provider(session_id: Optional[str] = None) -> List[Dict]:
         """Get usage breakdown by provider."""
-        conn = get_db_connection()
-        try:
+        TokenUsageRepository.flush()
+        with get_read_connection() as conn:
             query = """SELECT provider, model,
                         COUNT(*) as requests,
                         SUM(total_tokens) as total_tokens,
@@ -434,6 +535,39 @@ class TokenUsageRepository:
             query += " GROUP BY provider, model ORDER BY requests DESC"
 
             rows = conn.execute(query, params).fetchall()
-            return [dict(r) for r in rows]
-        finally:
-            conn.close()
+            return [_intern_columns(dict(r)) for r in rows]
+
+
+class OcrCacheRepository:
+    """Data access for cached image OCR results, keyed by a hash of the image URL."""
+
+    @staticmethod
+    def _key(url: str) -> bytes:
+        return hashlib.sha256(url.encode("utf-8")).digest()
+
+    @staticmethod
+    def get(url: str, max_age_days: int) -> Optional[Dict]:
+        """
+        Cached entry for `url` with its validators, or None. `fresh` tells
+        whether it was stored within the last `max_age_days`.
+        """
+        with get_read_connection() as conn:
+            row = conn.execute(
+                """SELECT etag, last_modified, text,
+                          updated_at > datetime('now', ?) AS fresh
+                   FROM ocr_cache WHERE url_hash = ?""",
+                (f"-{int(max_age_days)} days", OcrCacheRepository._key(url)),
+            ).fetchone()
+        return dict(row) if row else None
+
+    @staticmethod
+    def put(url: str, text: str, etag: Optional[str] = None,
+            last_modified: Optional[str] = None):
+        """Store (or replace) the OCR text for `url`."""
+        with get_write_connection() as conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO ocr_cache
+                   (url_hash, etag, last_modified, text, updated_at)
+                   VALUES (?, ?, ?, ?, datetime('now'))""",
+                (OcrCacheRepository._key(url), etag, last_modified, text),
+            )
@@ -3,45 +3,78 @@ PERSEPTOR v2.0 - Structured Logging Configuration
 JSON-formatted logging with rotating file handler, performance timers, and request tracking.
 """
 
+import atexit
 import logging
 import logging.handlers
 import json
 import os
+import queue
 import time
-import uuid
 import functools
-from datetime import datetime, timezone
+import threading
 from typing import Optional
 
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
+
+try:
+    from flask import request, g
+except ImportError:  # only needed by create_flask_request_logger
+    request = g = None
+
+
+def _dumps(obj: dict) -> str:
+    """Serialize a log entry to a JSON string (orjson when available)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=str).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, default=str)
+
+
+# (epoch second, "YYYY-MM-DDTHH:MM:SS") of the last formatted record. Swapped as
+# a whole tuple, so concurrent formatters never see a torn pair.
+_iso_second_cache = (-1, "")
+
+
+def _iso_utc(created: float) -> str:
+    """ISO-8601 UTC timestamp for a record's creation time, same shape as datetime.isoformat()."""
+    global _iso_second_cache
+    second = int(created)
+    cached = _iso_second_cache
+    if cached[0] != second:
+        cached = (second, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second)))
+        _iso_second_cache = cached
+    return f"{cached[1]}.{int((created - second) * 1_000_000):06d}+00:00"
+
+
+# `extra=` fields copied into JSON log entries, in output order
+_EXTRA_FIELDS = (
+    "request_id", "duration_ms", "provider", "model", "tokens", "endpoint", "status_code",
+)
+_EXTRA_KEYS = frozenset(_EXTRA_FIELDS)
+
 
 class JSONFormatter(logging.Formatter):
     """Structured JSON log formatter."""
 
     def format(self, record: logging.LogRecord) -> str:
+        # LogRecord fields are plain instance attributes; read them from the dict
+        attrs = record.__dict__
         log_entry = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "level": record.levelname,
-            "module": record.module,
-            "function": record.funcName,
-            "line": record.lineno,
+            "timestamp": _iso_utc(attrs["created"]),
+            "level": attrs["levelname"],
+            "module": attrs["module"],
+            "function": attrs["funcName"],
+            "line": attrs["lineno"],
             "message": record.getMessage(),
         }
 
-        # Add extra fields if present
-        if hasattr(record, "request_id"):
-            log_entry["request_id"] = record.request_id
-        if hasattr(record, "duration_ms"):
-            log_entry["duration_ms"] = record.duration_ms
-        if hasattr(record, "provider"):
-            log_entry["provider"] = record.provider
-        if hasattr(record, "model"):
-            log_entry["model"] = record.model
-        if hasattr(record, "tokens"):
-            log_entry["tokens"] = record.tokens
-        if hasattr(record, "endpoint"):
-            log_entry["endpoint"] = record.endpoint
-        if hasattr(record, "status_code"):
-            log_entry["status_code"] = record.status_code
+        # Add extra fields if present (most records carry none)
+        if not _EXTRA_KEYS.isdisjoint(attrs):
+            for key in _EXTRA_FIELDS:
+                if key in attrs:
+                    log_entry[key] = attrs[key]
 
         # Add exception info
         if record.exc_info and record.exc_info[1]:
@@ -51,7 +84,7 @@ class JSONFormatter(logging.Formatter):
                 "traceback": self.formatException(record.exc_info),
             }
 
-        return json.dumps(log_entry, ensure_ascii=False)
+        return _dumps(log_entry)
 
 
 class TextFormatter(logging.Formatter):
@@ -65,23 +98,33 @@ class TextFormatter(logging.Formatter):
         "CRITICAL": "\033[35m",  # Magenta
     }
     RESET = "\033[0m"
+    TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+    # (epoch second, formatted local time) of the last record, see _iso_utc
+    _second_cache = (-1, "")
+
+    def _timestamp(self, record: logging.LogRecord) -> str:
+        second = int(record.created)
+        cached = self._second_cache
+        if cached[0] != second:
+            cached = (second, self.formatTime(record, self.TIME_FORMAT))
+            self._second_cache = cached
+        return cached[1]
 
     def format(self, record: logging.LogRecord) -> str:
         color = self.COLORS.get(record.levelname, "")
         reset = self.RESET
 
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        prefix = f"{color}[{timestamp}] [{record.levelname:8s}]{reset}"
-        module_info = f"[{record.module}.{record.funcName}:{record.lineno}]"
-
-        parts = [prefix, module_info, record.getMessage()]
+        timestamp = self._timestamp(record)
+        msg = (
+            f"{color}[{timestamp}] [{record.levelname:8s}]{reset} "
+            f"[{record.module}.{record.funcName}:{record.lineno}] {record.getMessage()}"
+        )
 
         if hasattr(record, "duration_ms"):
-            parts.append(f"({record.duration_ms:.1f}ms)")
+            msg += f" ({record.duration_ms:.1f}ms)"
         if hasattr(record, "request_id"):
-            parts.append(f"[req:{record.request_id[:8]}]")
-
-        msg = " ".join(parts)
+            msg += f" [req:{record.request_id[:8]}]"
 
         if record.exc_info and record.exc_info[1]:
             msg += "\n" + self.formatException(record.exc_info)
@@ -89,6 +132,112 @@ class TextFormatter(logging.Formatter):
         return msg
 
 
+class BufferedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    RotatingFileHandler that writes through a 64 KiB buffer instead of
+    flushing every record. Buffered lines are flushed every FLUSH_EVERY
+    records, on the first record after FLUSH_INTERVAL seconds, or straight
+    away for WARNING and above. When no further record arrives, the log
+    queue listener flushes within FLUSH_INTERVAL of going idle. The file size
+    is tracked in memory, so the rollover check needs no seek/tell per record.
+    """
+
+    BUFFER_SIZE = 64 * 1024
+    FLUSH_EVERY = 64
+    FLUSH_INTERVAL = 1.0
+
+    def __init__(self, *args, **kwargs):
+        self._size = 0
+        self._pending = 0
+        self._last_flush = time.monotonic()
+        super().__init__(*args, **kwargs)
+
+    def _open(self):
+        stream = open(
+            self.baseFilename, self.mode, buffering=self.BUFFER_SIZE,
+            encoding=self.encoding, errors=getattr(self, "errors", None),
+        )
+        self._size = os.fstat(stream.fileno()).st_size
+        return stream
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            # Sizes are counted in characters, which is close enough for rotation
+            if self.maxBytes > 0 and self._size and self._size + len(msg) >= self.maxBytes:
+                self.doRollover()
+                if self.stream is None:
+                    self.stream = self._open()
+            self.stream.write(msg)
+            self._size += len(msg)
+            self._pending += 1
+            if (
+                record.levelno >= logging.WARNING
+                or self._pending >= self.FLUSH_EVERY
+                or time.monotonic() - self._last_flush >= self.FLUSH_INTERVAL
+            ):
+                self.flush()
+        except RecursionError:
+            raise
+        except Exception:
+            self.handleError(record)
+
+    def flush(self) -> None:
+        super().flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+
+class _LocalQueueHandler(logging.handlers.QueueHandler):
+    """
+    In-process queue handler. The stock prepare() pre-formats the record and
+    drops exc_info, which would flatten JSONFormatter's structured exception
+    field; here only the message is merged and the listener's handlers do
+    the real formatting on their own thread.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class _FlushingQueueListener(logging.handlers.QueueListener):
+    """
+    QueueListener that waits at most FLUSH_INTERVAL for the next record and
+    flushes any buffered handler output while idle, so lines logged just
+    before a quiet period are not held in memory indefinitely.
+    """
+
+    def dequeue(self, block: bool) -> logging.LogRecord:
+        while True:
+            try:
+                return self.queue.get(block, timeout=BufferedRotatingFileHandler.FLUSH_INTERVAL)
+            except queue.Empty:
+                if not block:
+                    raise
+                for handler in self.handlers:
+                    if getattr(handler, "_pending", 0):
+                        handler.flush()
+
+
+_queue_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _stop_queue_listener() -> None:
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()  # drains queued records before returning
+        for handler in _queue_listener.handlers:
+            handler.close()
+        _queue_listener = None
+
+
+atexit.register(_stop_queue_listener)
+
+
 def setup_logging(
     level: str = "INFO",
     log_format: str = "json",
@@ -110,7 +259,9 @@ def setup_logging(
     root_logger.setLevel(getattr(logging, level.upper(), logging.INFO))
 
     # Clear existing handlers
+    _stop_queue_listener()
     root_logger.handlers.clear()
+    handlers = []
 
     # Choose formatter
     if log_format == "json":
@@ -121,7 +272,7 @@ def setup_logging(
     # Console handler
     console_handler = logging.StreamHandler()
     console_handler.setFormatter(formatter)
-    root_logger.addHandler(console_handler)
+    handlers.append(console_handler)
 
     # File handler (if path provided)
     if file_path:
@@ -129,14 +280,24 @@ def setup_logging(
         if log_dir:
             os.makedirs(log_dir, exist_ok=True)
 
-        file_handler = logging.handlers.RotatingFileHandler(
+        file_handler = BufferedRotatingFileHandler(
             file_path,
             maxBytes=max_file_size_mb * 1024 * 1024,
             backupCount=backup_count,
             encoding="utf-8",
         )
         file_handler.setFormatter(JSONFormatter())  # Always JSON for files
-        root_logger.addHandler(file_handler)
+        handlers.append(file_handler)
+
+    # Request threads only enqueue; formatting and console/file I/O happen on
+    # the listener thread.
+    global _queue_listener
+    log_queue = queue.SimpleQueue()
+    root_logger.addHandler(_LocalQueueHandler(log_queue))
+    _queue_listener = _FlushingQueueListener(
+        log_queue, *handlers, respect_handler_level=True
+    )
+    _queue_listener.start()
 
     return root_logger
 
@@ -146,21 +307,30 @@ def get_logger(name: str) -> logging.Logger:
     return logging.getLogger(f"perseptor.{name}")
 
 
+@functools.lru_cache(maxsize=None)
+def _timer_logger(module: Optional[str]) -> logging.Logger:
+    """Logger for timed functions of a module, resolved once per module."""
+    return get_logger(module or "timer")
+
+
 def performance_timer(func):
     """Decorator to measure and log function execution time."""
+    logger = _timer_logger(func.__module__)
 
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        logger = get_logger(func.__module__ or "timer")
         start = time.perf_counter()
 
         try:
             result = func(*args, **kwargs)
-            elapsed_ms = (time.perf_counter() - start) * 1000
-            logger.info(
-                f"{func.__name__} completed",
-                extra={"duration_ms": elapsed_ms},
-            )
+            # Checked per call (the result is cached by the logger) so a level
+            # set by setup_logging after import is still honoured
+            if logger.isEnabledFor(logging.INFO):
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                logger.info(
+                    f"{func.__name__} completed",
+                    extra={"duration_ms": elapsed_ms},
+                )
             return result
         except Exception as e:
             elapsed_ms = (time.perf_counter() - start) * 1000
@@ -176,16 +346,17 @@ def performance_timer(func):
 
 async def async_performance_timer_wrapper(func, *args, **kwargs):
     """Async version of performance timer."""
-    logger = get_logger(func.__module__ or "timer")
+    logger = _timer_logger(func.__module__)
     start = time.perf_counter()
 
     try:
         result = await func(*args, **kwargs)
-        elapsed_ms = (time.perf_counter() - start) * 1000
-        logger.info(
-            f"{func.__name__} completed",
-            extra={"duration_ms": elapsed_ms},
-        )
+        if logger.isEnabledFor(logging.INFO):
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            logger.info(
+                f"{func.__name__} completed",
+                extra={"duration_ms": elapsed_ms},
+            )
         return result
     except Exception as e:
         elapsed_ms = (time.perf_counter() - start) * 1000
@@ -197,9 +368,32 @@ async def async_performance_timer_wrapper(func, *args, **kwargs):
         raise
 
 
+# Request IDs are cut from a per-thread pool of urandom bytes, refilled 4 KiB at
+# a time, instead of one urandom syscall + UUID object per request.
+_RID_POOL_BYTES = 4096
+_rid_local = threading.local()
+
+
+def _reset_request_id_pool() -> None:
+    # A forked worker must not hand out the same bytes as its parent
+    global _rid_local
+    _rid_local = threading.local()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_request_id_pool)
+
+
 def generate_request_id() -> str:
-    """Generate a unique request ID."""
-    return str(uuid.uuid4())
+    """Generate a unique request ID (128 random bits in UUID text layout)."""
+    pool = _rid_local
+    pos = getattr(pool, "pos", _RID_POOL_BYTES)
+    if pos >= _RID_POOL_BYTES:
+        pool.buf = os.urandom(_RID_POOL_BYTES)
+        pos = 0
+    pool.pos = pos + 16
+    h = pool.buf[pos:pos + 16].hex()
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
 
 
 def create_flask_request_logger(app):
@@ -211,30 +405,30 @@ def create_flask_request_logger(app):
 
     @app.before_request
     def log_request():
-        from flask import request, g
         g.request_id = generate_request_id()
         g.request_start = time.perf_counter()
-        logger.info(
-            f"{request.method} {request.path}",
-            extra={
-                "request_id": g.request_id,
-                "endpoint": request.path,
-            },
-        )
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(
+                f"{request.method} {request.path}",
+                extra={
+                    "request_id": g.request_id,
+                    "endpoint": request.path,
+                },
+            )
 
     @app.after_request
     def log_response(response):
-        from flask import request, g
-        duration_ms = (time.perf_counter() - g.get("request_start", time.perf_counter())) * 1000
-        logger.info(
-            f"{request.method} {request.path} -> {response.status_code}",
-            extra={
-                "request_id": g.get("request_id", "unknown"),
-                "endpoint": request.path,
-                "status_code": response.status_code,
-                "duration_ms": duration_ms,
-            },
-        )
+        if logger.isEnabledFor(logging.INFO):
+            duration_ms = (time.perf_counter() - g.get("request_start", time.perf_counter())) * 1000
+            logger.info(
+                f"{request.method} {request.path} -> {response.status_code}",
+                extra={
+                    "request_id": g.get("request_id", "unknown"),
+                    "endpoint": request.path,
+                    "status_code": response.status_code,
+                    "duration_ms": duration_ms,
+                },
+            )
         # Add request ID to response headers
         response.headers["X-Request-ID"] = g.get("request_id", "unknown")
         return response
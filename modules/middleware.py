@@ -3,10 +3,12 @@ PERSEPTOR v2.0 - Flask Middleware
 Rate limiting, input validation, and content-type enforcement.
 """
 
+import math
 import time
-from collections import defaultdict
+from collections import OrderedDict
 from threading import Lock
 from functools import wraps
+from typing import Tuple
 from flask import request, jsonify, g
 from modules.config import config
 from modules.logging_config import get_logger
@@ -16,41 +18,83 @@ logger = get_logger("middleware")
 
 class RateLimiter:
     """
-    Token bucket rate limiter.
+    Sliding-window counter rate limiter.
     Thread-safe, in-memory implementation.
+
+    Each key keeps [window_index, current_count, previous_count]. The request
+    rate over the trailing window is estimated as
+    previous_count * (unelapsed fraction of the current window) + current_count,
+    which is O(1) time and constant memory per key regardless of max_requests.
+    Windows are counted on the monotonic clock, so wall-clock (NTP) jumps
+    cannot shift them.
+
+    Keys are spread over lock-striped shards so concurrent requests from
+    different clients rarely wait on each other. Each shard is kept in LRU
+    order and capped, so scans with spoofed addresses or session tokens
+    cannot grow memory without bound.
     """
 
-    def __init__(self, max_requests: int = 60, window_seconds: int = 60):
+    _SHARD_COUNT = 16  # power of two, shard index is hash & (count - 1)
+
+    def __init__(self, max_requests: int = 60, window_seconds: int = 60,
+                 max_keys: int = 100_000):
         self.max_requests = max_requests
         self.window_seconds = window_seconds
-        self._buckets = defaultdict(list)
-        self._lock = Lock()
+        self._shard_capacity = max(1, max_keys // self._SHARD_COUNT)
+        self._shards = [(Lock(), OrderedDict()) for _ in range(self._SHARD_COUNT)]
+
+    def _shard(self, key: str):
+        """Return the (lock, buckets) stripe that owns `key`."""
+        return self._shards[hash(key) & (self._SHARD_COUNT - 1)]
+
+    def _estimate(self, bucket: list, now: float) -> float:
+        """Roll the bucket forward to the current window and return the estimated count."""
+        window = int(now // self.window_seconds)
+        elapsed_windows = window - bucket[0]
+        if elapsed_windows:
+            # One window on: current becomes previous. Further: both expired.
+            bucket[2] = bucket[1] if elapsed_windows == 1 else 0
+            bucket[1] = 0
+            bucket[0] = window
+        weight = 1.0 - (now % self.window_seconds) / self.window_seconds
+        return bucket[2] * weight + bucket[1]
+
+    def check(self, key: str) -> Tuple[bool, int]:
+        """
+        Check and, if allowed, record a request for the key in one step.
+        Returns (allowed, remaining requests after this one).
+        """
+        now = time.monotonic()
+        lock, buckets = self._shard(key)
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                bucket = buckets[key] = [int(now // self.window_seconds), 0, 0]
+                if len(buckets) > self._shard_capacity:
+                    buckets.popitem(last=False)  # least recently seen key
+            else:
+                buckets.move_to_end(key)
+            estimate = self._estimate(bucket, now)
+            # Check limit
+            if estimate >= self.max_requests:
+                return False, 0
+            # Record request
+            bucket[1] += 1
+            return True, max(0, math.ceil(self.max_requests - estimate - 1))
 
     def is_allowed(self, key: str) -> bool:
         """Check if request is allowed for the given key."""
-        now = time.time()
-        with self._lock:
-            # Clean old entries
-            self._buckets[key] = [
-                t for t in self._buckets[key]
-                if now - t < self.window_seconds
-            ]
-            # Check limit
-            if len(self._buckets[key]) >= self.max_requests:
-                return False
-            # Record request
-            self._buckets[key].append(now)
-            return True
+        return self.check(key)[0]
 
     def remaining(self, key: str) -> int:
         """Get remaining requests for the key."""
-        now = time.time()
-        with self._lock:
-            self._buckets[key] = [
-                t for t in self._buckets[key]
-                if now - t < self.window_seconds
-            ]
-            return max(0, self.max_requests - len(self._buckets[key]))
+        now = time.monotonic()
+        lock, buckets = self._shard(key)
+        with lock:
+            bucket = buckets.get(key)
+            if bucket is None:
+                return self.max_requests
+            return max(0, math.ceil(self.max_requests - self._estimate(bucket, now)))
 
 
 # Global rate limiter instances
@@ -82,8 +126,8 @@ def rate_limit(limiter_type: str = "read"):
             if session_token:
                 client_key = f"{client_key}:{session_token[:8]}"
 
-            if not limiter.is_allowed(client_key):
-                remaining = limiter.remaining(client_key)
+            allowed, remaining = limiter.check(client_key)
+            if not allowed:
                 logger.warning(f"Rate limit exceeded for {client_key}")
                 return jsonify({
                     "error": "Rate limit exceeded. Please try again later.",
@@ -94,9 +138,7 @@ def rate_limit(limiter_type: str = "read"):
             # Add rate limit headers to response
             response = f(*args, **kwargs)
             if hasattr(response, "headers"):
-                response.headers["X-RateLimit-Remaining"] = str(
-                    limiter.remaining(client_key)
-                )
+                response.headers["X-RateLimit-Remaining"] = str(remaining)
             return response
 
         return decorated_function
@@ -121,14 +163,16 @@ def validate_request_size(max_mb: int = None):
     if max_mb is None:
         max_mb = config.security.max_upload_size_mb
 
+    # Limit and rejection body are fixed once the route is registered
+    max_bytes = max_mb * 1024 * 1024
+    error_body = {"error": f"Request too large. Maximum size: {max_mb}MB"}
+
     def decorator(f):
         @wraps(f)
         def decorated_function(*args, **kwargs):
             content_length = request.content_length
-            if content_length and content_length > max_mb * 1024 * 1024:
-                return jsonify({
-                    "error": f"Request too large. Maximum size: {max_mb}MB"
-                }), 413
+            if content_length and content_length > max_bytes:
+                return jsonify(error_body), 413
             return f(*args, **kwargs)
         return decorated_function
     return decorator
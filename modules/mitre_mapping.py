@@ -3,11 +3,29 @@ PERSEPTOR v2.0 - MITRE ATT&CK Mapping Module
 Maps IoCs and TTPs to MITRE ATT&CK framework techniques.
 """
 
+import re
+from collections import defaultdict
+from itertools import chain
+from operator import itemgetter
 from typing import List, Dict, Optional
 from modules.logging_config import get_logger
 
+try:
+    import ahocorasick
+except ImportError:  # optional, keywords fall back to per-keyword scans
+    ahocorasick = None
+
+try:
+    import re2
+except ImportError:  # optional linear-time engine for the technique ID scan
+    re2 = None
+
 logger = get_logger("mitre_mapping")
 
+# Technique IDs: T followed by 4 digits, optionally .3 digits. RE2 keeps the
+# scan linear on large AI-generated TTP payloads; findall() is the same API.
+_TID_RE = (re2 or re).compile(r'T[0-9]{4}(?:\.[0-9]{3})?')
+
 # MITRE ATT&CK Technique Database (commonly encountered in threat reports)
 TECHNIQUE_DB = {
     # Initial Access
@@ -88,6 +106,85 @@ TECHNIQUE_DB = {
     "T1489": {"name": "Service Stop", "tactic": "impact", "keywords": ["stop service", "net stop", "sc stop", "taskkill"]},
 }
 
+# Keywords shorter than this only count on word boundaries, to avoid
+# substring false positives ("rce" in "source")
+_SHORT_KEYWORD_LEN = 5
+
+# TECHNIQUE_DB as parallel tuples in DB order (position = technique), so the
+# keyword-match loop indexes flat tuples instead of nested dicts and only
+# reads names/tactics for techniques that actually match
+_TECH_IDS = tuple(TECHNIQUE_DB)
+_TECH_NAMES = tuple(tech["name"] for tech in TECHNIQUE_DB.values())
+_TECH_TACTICS = tuple(tech["tactic"] for tech in TECHNIQUE_DB.values())
+_TECH_KEYWORDS = tuple(
+    tuple(kw.lower() for kw in tech["keywords"]) for tech in TECHNIQUE_DB.values()
+)
+
+
+def _build_keyword_techniques() -> Dict[str, tuple]:
+    """keyword -> positions of the techniques listing it."""
+    positions = defaultdict(list)
+    for pos, keywords in enumerate(_TECH_KEYWORDS):
+        for kw in keywords:
+            positions[kw].append(pos)
+    return {kw: tuple(p) for kw, p in positions.items()}
+
+
+_KEYWORD_TECHNIQUES = _build_keyword_techniques()
+_TECHNIQUE_POS = {tid: pos for pos, tid in enumerate(_TECH_IDS)}
+# Multi-word keywords are specific enough to count as a match on their own
+_MULTIWORD_KEYWORDS = frozenset(kw for kw in _KEYWORD_TECHNIQUES if len(kw.split()) >= 2)
+_ALL_KEYWORDS = tuple(_KEYWORD_TECHNIQUES)
+
+
+def _build_keyword_automaton():
+    """One Aho-Corasick automaton over every TECHNIQUE_DB keyword."""
+    if ahocorasick is None:
+        return None
+    automaton = ahocorasick.Automaton()
+    for kw in _ALL_KEYWORDS:
+        automaton.add_word(kw, kw)
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+def _at_word_boundary(text: str, pos: int) -> bool:
+    """Same test as regex \\b at index `pos` of `text`."""
+    before = pos > 0 and _is_word_char(text[pos - 1])
+    after = pos < len(text) and _is_word_char(text[pos])
+    return before != after
+
+
+def _find_keywords(text: str) -> set:
+    """Return every TECHNIQUE_DB keyword present in `text` (already lowercased)."""
+    if _KEYWORD_AUTOMATON is None:
+        found = set()
+        for kw in _ALL_KEYWORDS:
+            if len(kw) < _SHORT_KEYWORD_LEN:
+                if re.search(r'\b' + re.escape(kw) + r'\b', text):
+                    found.add(kw)
+            elif kw in text:
+                found.add(kw)
+        return found
+
+    found = set()
+    for end, kw in _KEYWORD_AUTOMATON.iter(text):
+        if kw in found:
+            continue
+        if len(kw) < _SHORT_KEYWORD_LEN:
+            start = end - len(kw) + 1
+            if not (_at_word_boundary(text, start) and _at_word_boundary(text, end + 1)):
+                continue
+        found.add(kw)
+    return found
+
 
 TACTIC_NORMALIZE = {
     "initial access": "initial_access",
@@ -129,6 +226,30 @@ def _normalize_tactic(tactic: str) -> str:
     return TACTIC_NORMALIZE.get(normalized, tactic.strip().lower().replace(" ", "_"))
 
 
+def _ai_technique_match(tid: str, description: str = "", technique_name: str = "",
+                        tactic: str = "") -> Dict:
+    """Build the match entry for a technique ID reported by the AI."""
+    if tid in TECHNIQUE_DB:
+        tech = TECHNIQUE_DB[tid]
+        return {
+            "technique_id": tid,
+            "technique_name": tech["name"],
+            "tactic": tech["tactic"],
+            "confidence": 0.95,
+            "source": "ai_extracted",
+            "description": description or f"AI identified {tech['name']} technique used in this attack.",
+        }
+    # Technique not in our DB — preserve AI-extracted data
+    return {
+        "technique_id": tid,
+        "technique_name": technique_name or f"Technique {tid}",
+        "tactic": _normalize_tactic(tactic),
+        "confidence": 0.90,
+        "source": "ai_extracted",
+        "description": description or f"AI identified technique {tid} used in this attack.",
+    }
+
+
 def map_iocs_to_mitre(analysis_data: dict) -> List[Dict]:
     """
     Map IoCs and TTPs from analysis data to MITRE ATT&CK techniques.
@@ -139,99 +260,61 @@ def map_iocs_to_mitre(analysis_data: dict) -> List[Dict]:
     matches = []
     seen_techniques = set()
 
-    # First, check if TTPs were already identified by the AI
-    ttps = analysis_data.get("ttps", [])
-    for ttp in ttps:
-        ttp_str = str(ttp).upper() if not isinstance(ttp, dict) else str(ttp.get("mitre_id", "")).upper()
-        # Extract technique IDs (T followed by 4 digits, optionally .3 digits)
-        technique_ids = set()
-        import re
-        for m in re.finditer(r'T\d{4}(?:\.\d{3})?', ttp_str):
-            technique_ids.add(m.group())
-
-        # Get description and metadata from AI-extracted TTP
-        ttp_description = ""
-        ttp_technique_name = ""
-        ttp_tactic = ""
+    # First, check if TTPs were already identified by the AI, in the order
+    # given. Only structured TTPs carry a description, name and tactic.
+    for ttp in analysis_data.get("ttps", []):
         if isinstance(ttp, dict):
+            ttp_str = str(ttp.get("mitre_id", "")).upper()
             ttp_description = ttp.get("description", "")
             ttp_technique_name = ttp.get("technique_name", "")
             ttp_tactic = ttp.get("tactic", "")
+        else:
+            ttp_str = str(ttp).upper()
+            ttp_description = ttp_technique_name = ttp_tactic = ""
 
-        for tid in technique_ids:
-            if tid in seen_techniques:
-                continue
-            seen_techniques.add(tid)
-
-            if tid in TECHNIQUE_DB:
-                tech = TECHNIQUE_DB[tid]
-                matches.append({
-                    "technique_id": tid,
-                    "technique_name": tech["name"],
-                    "tactic": tech["tactic"],
-                    "confidence": 0.95,
-                    "source": "ai_extracted",
-                    "description": ttp_description or f"AI identified {tech['name']} technique used in this attack.",
-                })
-            else:
-                # Technique not in our DB — preserve AI-extracted data
-                normalized_tactic = _normalize_tactic(ttp_tactic)
-                matches.append({
-                    "technique_id": tid,
-                    "technique_name": ttp_technique_name or f"Technique {tid}",
-                    "tactic": normalized_tactic,
-                    "confidence": 0.90,
-                    "source": "ai_extracted",
-                    "description": ttp_description or f"AI identified technique {tid} used in this attack.",
-                })
+        for tid in dict.fromkeys(_TID_RE.findall(ttp_str)):
+            if tid not in seen_techniques:
+                seen_techniques.add(tid)
+                matches.append(_ai_technique_match(tid, ttp_description, ttp_technique_name, ttp_tactic))
 
     # Then, keyword-match IoC content against technique database
-    all_text_parts = []
-
     iocs = analysis_data.get("indicators_of_compromise", {})
-    for ioc_type, indicators in iocs.items():
-        if isinstance(indicators, list):
-            all_text_parts.extend(str(i).lower() for i in indicators)
+    all_text_parts = list(map(str, chain.from_iterable(
+        indicators for indicators in iocs.values() if isinstance(indicators, list)
+    )))
 
     # Add threat actors and tools
-    actors = analysis_data.get("threat_actors", [])
-    all_text_parts.extend(str(a).lower() for a in actors)
+    all_text_parts.extend(map(str, analysis_data.get("threat_actors", [])))
+    all_text_parts.extend(map(str, analysis_data.get("tools_or_malware", [])))
 
-    tools = analysis_data.get("tools_or_malware", [])
-    all_text_parts.extend(str(t).lower() for t in tools)
+    # Lowercase once over the joined text rather than per item
+    combined_text = " ".join(all_text_parts).lower()
 
-    combined_text = " ".join(all_text_parts)
+    # One pass over the text finds every keyword; only techniques that own
+    # a found keyword are visited, in TECHNIQUE_DB order
+    hits = defaultdict(set)
+    for kw in _find_keywords(combined_text):
+        for pos in _KEYWORD_TECHNIQUES[kw]:
+            hits[pos].add(kw)
 
-    for tid, tech in TECHNIQUE_DB.items():
-        if tid in seen_techniques:
-            continue
+    # Techniques the AI already reported are dropped up front
+    for tid in seen_techniques:
+        hits.pop(_TECHNIQUE_POS.get(tid), None)
 
-        # Use word-boundary-aware matching to avoid substring false positives
-        matched_kws = []
-        for kw in tech["keywords"]:
-            # For multi-word keywords, simple 'in' check is fine
-            # For single-word keywords >= 5 chars, also fine
-            # For short keywords < 5 chars, require word boundaries
-            if len(kw) < 5:
-                # Short keyword — require word boundary matching
-                import re as _re
-                if _re.search(r'\b' + _re.escape(kw) + r'\b', combined_text):
-                    matched_kws.append(kw)
-            else:
-                if kw in combined_text:
-                    matched_kws.append(kw)
+    for pos in sorted(hits):
+        found_kws = hits[pos]
+        matched_kws = [kw for kw in _TECH_KEYWORDS[pos] if kw in found_kws]
 
         keyword_hits = len(matched_kws)
         # Require at least 2 keyword hits for a match, unless it's a very specific keyword (multi-word)
-        min_hits = 1 if any(len(kw.split()) >= 2 for kw in matched_kws) else 2
+        min_hits = 2 if _MULTIWORD_KEYWORDS.isdisjoint(matched_kws) else 1
         if keyword_hits >= min_hits:
             confidence = min(0.85, 0.35 + (keyword_hits * 0.15))
-            seen_techniques.add(tid)
             kw_evidence = ", ".join(matched_kws[:5])
             matches.append({
-                "technique_id": tid,
-                "technique_name": tech["name"],
-                "tactic": tech["tactic"],
+                "technique_id": _TECH_IDS[pos],
+                "technique_name": _TECH_NAMES[pos],
+                "tactic": _TECH_TACTICS[pos],
                 "confidence": round(confidence, 2),
                 "source": "keyword_match",
                 "keyword_hits": keyword_hits,
@@ -239,7 +322,7 @@ def map_iocs_to_mitre(analysis_data: dict) -> List[Dict]:
             })
 
     # Sort by confidence descending
-    matches.sort(key=lambda x: x["confidence"], reverse=True)
+    matches.sort(key=itemgetter("confidence"), reverse=True)
 
     logger.info(f"MITRE ATT&CK mapping: {len(matches)} techniques identified")
     return matches
@@ -247,15 +330,10 @@ def map_iocs_to_mitre(analysis_data: dict) -> List[Dict]:
 
 def get_mitre_tags(techniques: List[Dict]) -> List[str]:
     """Convert technique list to Sigma-compatible MITRE tags."""
-    tags = set()
-    for tech in techniques:
-        tactic = tech.get("tactic", "")
-        tid = tech.get("technique_id", "")
-        if tactic:
-            tags.add(f"attack.{tactic}")
-        if tid:
-            tags.add(f"attack.{tid.lower()}")
-    return sorted(tags)
+    return sorted(
+        {f"attack.{tactic}" for tech in techniques if (tactic := tech.get("tactic"))}
+        | {f"attack.{tid.lower()}" for tech in techniques if (tid := tech.get("technique_id"))}
+    )
 
 
 def get_tactic_summary(techniques: List[Dict]) -> Dict[str, int]:
@@ -267,20 +345,22 @@ def get_tactic_summary(techniques: List[Dict]) -> Dict[str, int]:
     return summary
 
 
+_PHASE_ORDER = {
+    "initial_access": 1,
+    "execution": 2,
+    "persistence": 3,
+    "privilege_escalation": 4,
+    "defense_evasion": 5,
+    "credential_access": 6,
+    "discovery": 7,
+    "lateral_movement": 8,
+    "collection": 9,
+    "command_and_control": 10,
+    "exfiltration": 11,
+    "impact": 12,
+}
+
+
 def get_kill_chain_phase(tactic: str) -> int:
     """Get the kill chain phase number for a tactic (for ordering)."""
-    phase_order = {
-        "initial_access": 1,
-        "execution": 2,
-        "persistence": 3,
-        "privilege_escalation": 4,
-        "defense_evasion": 5,
-        "credential_access": 6,
-        "discovery": 7,
-        "lateral_movement": 8,
-        "collection": 9,
-        "command_and_control": 10,
-        "exfiltration": 11,
-        "impact": 12,
-    }
-    return phase_order.get(tactic, 99)
+    return _PHASE_ORDER.get(tactic, 99)
@@ -1,4 +1,5 @@
 import os
+import re
 import logging
 from datetime import datetime
 from typing import Dict, List, Optional, Union, Any
@@ -20,9 +21,6 @@ from reportlab.graphics.charts.legends import Legend
 from reportlab.graphics.charts.textlabels import Label
 from reportlab.graphics.charts.piecharts import Pie
 from reportlab.graphics import renderPDF
-import matplotlib.pyplot as plt
-import seaborn as sns
-from io import BytesIO
 import base64
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
@@ -35,6 +33,59 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Chart colours: deep blue bars, Blues palette for pie slices
+_CHART_BAR_COLOR = colors.HexColor('#1a237e')
+_CHART_PIE_COLORS = [colors.HexColor(c) for c in (
+    '#0d47a1', '#1565c0', '#1976d2', '#1e88e5', '#42a5f5', '#90caf9'
+)]
+
+# Markers of rule/config text that should be rendered as preformatted code
+_CODE_INDICATOR_RE = re.compile(r'rule |meta:|strings:|condition:|yaml|json', re.IGNORECASE)
+
+
+def _header_table_style(header_color: str) -> TableStyle:
+    """Table style with a coloured header row over a white body."""
+    return TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor(header_color)),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('BACKGROUND', (0, 1), (-1, -1), colors.white),
+        ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#424242')),  # Grey 800
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (-1, -1), 9),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e0e0e0')),  # Grey 300
+        ('VALIGN', (0, 0), (-1, -1), 'TOP')
+    ])
+
+
+# Table styles are immutable once built, so every table shares these instances
+_HEADER_TABLE_STYLE = _header_table_style('#1a237e')  # Deep blue
+_CHAIN_TABLE_STYLE = _header_table_style('#283593')  # Indigo
+
+_KEY_VALUE_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f5f5f5')),  # Grey 100
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#424242')),  # Grey 800
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 9),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ('TOPPADDING', (0, 0), (-1, -1), 6),
+    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e0e0e0')),  # Grey 300
+    ('VALIGN', (0, 0), (-1, -1), 'TOP')
+])
+
+_METRICS_TABLE_STYLE = TableStyle([
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F8F9FA')),
+    ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2C3E50')),
+    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+    ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 0), (-1, -1), 10),
+    ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#DEE2E6'))
+])
+
 @dataclass
 class ReportSection:
     """Represents a section in the PDF report."""
@@ -54,6 +105,18 @@ class PDFReportGenerator:
         self.styles = getSampleStyleSheet()
         self._setup_styles()
         self._ensure_output_dir()
+
+        # Fixed per generator: page layout and the styles generate_report uses
+        self._doc_kwargs = dict(
+            pagesize=letter,
+            rightMargin=72,
+            leftMargin=72,
+            topMargin=72,
+            bottomMargin=72,
+        )
+        self._style_title = self.styles['CustomTitle']
+        self._style_section_title = self.styles['SectionTitle']
+        self._style_content = self.styles['Content']
         
     def _setup_styles(self):
         """Setup custom styles for the report."""
@@ -160,8 +223,14 @@ class PDFReportGenerator:
         elements.append(HRFlowable(width="100%", thickness=1, color=colors.HexColor('#e0e0e0')))
         elements.append(Spacer(1, 12))
         
-        # Add section content
-        for item in section.content:
+        elements.extend(self._content_flowables(section.content))
+        elements.append(Spacer(1, 12))
+        return elements
+
+    def _content_flowables(self, content: List[Any]) -> List[Any]:
+        """Convert section content items (text, dicts, lists, tables) to flowables."""
+        elements = []
+        for item in content:
             if isinstance(item, str):
                 if self._is_code_block(item):
                     elements.append(Preformatted(item, self.styles['CustomCode']))
@@ -171,16 +240,13 @@ class PDFReportGenerator:
                 elements.extend(self._handle_dict_content(item))
             elif isinstance(item, list):
                 elements.extend(self._handle_list_content(item))
-            elif isinstance(item, (Image, Table)):
+            elif isinstance(item, (Image, Table, Drawing)):
                 elements.append(item)
-        
-        elements.append(Spacer(1, 12))
         return elements
 
     def _is_code_block(self, text: str) -> bool:
         """Check if text should be formatted as code."""
-        code_indicators = ['rule ', 'meta:', 'strings:', 'condition:', 'yaml', 'json']
-        return any(indicator in text.lower() for indicator in code_indicators)
+        return _CODE_INDICATOR_RE.search(text) is not None
 
     def _handle_dict_content(self, content: Dict) -> List[Any]:
         """Handle dictionary content in the report."""
@@ -201,17 +267,7 @@ class PDFReportGenerator:
                 ])
             
             table = Table(table_data, colWidths=[2*inch, 4*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#f5f5f5')),  # Grey 100
-                ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#424242')),  # Grey 800
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 6),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e0e0e0')),  # Grey 300
-                ('VALIGN', (0, 0), (-1, -1), 'TOP')
-            ]))
+            table.setStyle(_KEY_VALUE_TABLE_STYLE)
             elements.append(table)
         
         return elements
@@ -230,20 +286,7 @@ class PDFReportGenerator:
                 table_data.append([ioc_type, values])
             
             table = Table(table_data, colWidths=[2*inch, 4*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a237e')),  # Deep blue
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#424242')),  # Grey 800
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e0e0e0')),  # Grey 300
-                ('VALIGN', (0, 0), (-1, -1), 'TOP')
-            ]))
+            table.setStyle(_HEADER_TABLE_STYLE)
             elements.append(table)
             elements.append(Spacer(1, 12))
 
@@ -259,20 +302,7 @@ class PDFReportGenerator:
                 ])
             
             table = Table(table_data, colWidths=[1.5*inch, 2*inch, 2.5*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a237e')),  # Deep blue
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#424242')),  # Grey 800
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e0e0e0')),  # Grey 300
-                ('VALIGN', (0, 0), (-1, -1), 'TOP')
-            ]))
+            table.setStyle(_HEADER_TABLE_STYLE)
             elements.append(table)
             elements.append(Spacer(1, 12))
 
@@ -289,20 +319,7 @@ class PDFReportGenerator:
                     ])
                 
                 table = Table(table_data, colWidths=[1*inch, 2*inch, 3*inch])
-                table.setStyle(TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#283593')),  # Indigo
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                    ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                    ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                    ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#424242')),  # Grey 800
-                    ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                    ('FONTSIZE', (0, 1), (-1, -1), 9),
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e0e0e0')),  # Grey 300
-                    ('VALIGN', (0, 0), (-1, -1), 'TOP')
-                ]))
+                table.setStyle(_CHAIN_TABLE_STYLE)
                 elements.append(table)
                 elements.append(Spacer(1, 12))
 
@@ -323,59 +340,77 @@ class PDFReportGenerator:
                 elements.extend(self._handle_list_content(item))
         return elements
 
-    def _create_chart(self, data: Dict[str, float], chart_type: str = 'bar') -> Image:
-        """Create a chart and return it as a ReportLab Image."""
-        plt.figure(figsize=(6, 4))
-        plt.style.use('seaborn')
-        
+    def _create_chart(self, data: Dict[str, float], chart_type: str = 'bar') -> Drawing:
+        """Create a chart as a vector ReportLab Drawing."""
+        drawing = Drawing(6*inch, 3*inch)
+        labels = [str(key) for key in data.keys()]
+        values = list(data.values())
+
+        if not values:
+            # Nothing to plot; ReportLab's charts fail on empty data
+            return drawing
+
         if chart_type == 'bar':
-            plt.bar(data.keys(), data.values(), color='#1a237e')  # Deep blue
-            plt.xticks(rotation=45, ha='right')
+            chart = VerticalBarChart()
+            chart.x = 40
+            chart.y = 50
+            chart.width = drawing.width - 60
+            chart.height = drawing.height - 70
+            chart.data = [values]
+            chart.bars[0].fillColor = _CHART_BAR_COLOR
+            chart.bars.strokeColor = None
+            chart.valueAxis.valueMin = 0
+            chart.categoryAxis.categoryNames = labels
+            chart.categoryAxis.labels.angle = 45
+            chart.categoryAxis.labels.boxAnchor = 'ne'
+            chart.categoryAxis.labels.fontName = 'Helvetica'
+            chart.categoryAxis.labels.fontSize = 8
+            chart.valueAxis.labels.fontName = 'Helvetica'
+            chart.valueAxis.labels.fontSize = 8
+            drawing.add(chart)
         elif chart_type == 'pie':
-            plt.pie(data.values(), labels=data.keys(), autopct='%1.1f%%',
-                   colors=sns.color_palette('Blues_d'))
-        
-        plt.tight_layout()
-        
-        # Save plot to a BytesIO object
-        buf = BytesIO()
-        plt.savefig(buf, format='png', dpi=300, bbox_inches='tight')
-        plt.close()
-        
-        # Create ReportLab Image from the BytesIO object
-        buf.seek(0)
-        img = Image(buf)
-        img.drawHeight = 3*inch
-        img.drawWidth = 6*inch
-        
-        return img
+            total = sum(values) or 1
+            chart = Pie()
+            chart.height = chart.width = drawing.height - 60
+            chart.x = (drawing.width - chart.width) / 2
+            chart.y = 30
+            chart.data = values
+            chart.labels = [f"{label} ({value / total:.1%})" for label, value in zip(labels, values)]
+            chart.simpleLabels = 1
+            chart.slices.strokeColor = colors.white
+            chart.slices.fontName = 'Helvetica'
+            chart.slices.fontSize = 8
+            for i in range(len(values)):
+                chart.slices[i].fillColor = _CHART_PIE_COLORS[i % len(_CHART_PIE_COLORS)]
+            drawing.add(chart)
+
+        return drawing
 
     def generate_report(self, title: str, sections: list[ReportSection]) -> bytes:
+        """Render the report to PDF and return the document bytes."""
         buffer = io.BytesIO()
-            doc = SimpleDocTemplate(
-            buffer,
-                pagesize=letter,
-                rightMargin=72,
-                leftMargin=72,
-                topMargin=72,
-                bottomMargin=72
-            )
-            
+        doc = SimpleDocTemplate(buffer, **self._doc_kwargs)
+        content_style = self._style_content
+        section_title_style = self._style_section_title
+
         story = []
         
         # Add title
-        story.append(Paragraph(title, self.styles['CustomTitle']))
+        story.append(Paragraph(title, self._style_title))
         story.append(Spacer(1, 12))
         
         # Add timestamp
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        story.append(Paragraph(f"Generated on: {timestamp}", self.styles['Content']))
+        story.append(Paragraph(f"Generated on: {timestamp}", content_style))
         story.append(Spacer(1, 24))
-            
-            # Add sections
+
+        # Add sections
         for section in sections:
-            story.append(Paragraph(section.title, self.styles['SectionTitle']))
-            story.append(Paragraph(section.content, self.styles['Content']))
+            story.append(Paragraph(section.title, section_title_style))
+            if isinstance(section.content, str):
+                story.append(Paragraph(section.content, content_style))
+            else:
+                story.extend(self._content_flowables(section.content))
             story.append(Spacer(1, 12))
             
         # Build PDF
@@ -412,20 +447,7 @@ class PDFReportGenerator:
                 ])
             
             table = Table(table_data, colWidths=[3*inch, 1*inch, 2*inch])
-            table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1a237e')),  # Deep blue
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('TEXTCOLOR', (0, 1), (-1, -1), colors.HexColor('#424242')),  # Grey 800
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 9),
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#e0e0e0')),  # Grey 300
-                ('VALIGN', (0, 0), (-1, -1), 'TOP')
-            ]))
+            table.setStyle(_HEADER_TABLE_STYLE)
             content.append(table)
             content.append(Spacer(1, 12))
         
@@ -453,14 +475,7 @@ class PDFReportGenerator:
             [[k, f"{v:.2f}"] for k, v in metrics.items()],
             colWidths=[2*inch, 1*inch]
         )
-        metrics_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F8F9FA')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#2C3E50')),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('GRID', (0, 0), (-1, -1), 1, colors.HexColor('#DEE2E6'))
-        ]))
+        metrics_table.setStyle(_METRICS_TABLE_STYLE)
         content.append(metrics_table)
         
         return ReportSection(
@@ -30,7 +30,8 @@ class ResponseCache:
     def _make_key(*args, **kwargs) -> str:
         """Create a deterministic cache key from arguments."""
         key_data = str(args) + str(sorted(kwargs.items()))
-        return hashlib.sha256(key_data.encode()).hexdigest()[:32]
+        # 128-bit BLAKE2b: same 32-char hex key without hashing bytes we discard
+        return hashlib.blake2b(key_data.encode(), digest_size=16).hexdigest()
 
     def get(self, key: str) -> Optional[Any]:
         """Get a cached value if it exists and hasn't expired."""
@@ -7,11 +7,16 @@ Produces "Direct Hit" quality results that SOC analysts can deploy immediately.
 
 import os
 import re
+import json
+import string
 import math
 import yaml
+import hashlib
+import tempfile
 import concurrent.futures
 from collections import defaultdict
-from typing import List, Dict, Set, Tuple, Optional
+from typing import List, Dict, Iterator, Set, Tuple, Optional
+from modules.config import config
 from modules.logging_config import get_logger
 
 logger = get_logger("sigma_matcher")
@@ -21,10 +26,26 @@ try:
 except ImportError:
     from yaml import SafeLoader as Loader
 
+try:
+    import orjson
+except ImportError:  # optional speedup, stdlib json is the fallback
+    orjson = None
+
+try:
+    import ahocorasick
+except ImportError:  # optional, phrases fall back to per-rule substring checks
+    ahocorasick = None
+
 SIGMAHQ_BASE_URL = os.environ.get(
     "SIGMAHQ_BASE_URL", "https://github.com/SigmaHQ/sigma/blob/master"
 )
 
+# Threads used to parse rule files when no cache is available
+SIGMA_LOAD_WORKERS = 8
+
+# Pre-parsed rules are cached in config.sigma_cache_dir so warm starts skip YAML
+SIGMA_CACHE_PREFIX = "sigma_cache_"
+
 # ─── IoC-Type → Logsource Category Mapping ──────────────────────────────────
 IOC_TO_LOGSOURCE: Dict[str, List[str]] = {
     "ips": ["network_connection", "firewall"],
@@ -39,16 +60,17 @@ IOC_TO_LOGSOURCE: Dict[str, List[str]] = {
 
 # ─── MITRE Technique Pattern ────────────────────────────────────────────────
 _TECHNIQUE_RE = re.compile(r"attack\.t(\d{4}(?:\.\d{3})?)", re.IGNORECASE)
+_TTP_ID_RE = re.compile(r"T(\d{4}(?:\.\d{3})?)")
 
 # ─── Stopwords ──────────────────────────────────────────────────────────────
-_CUSTOM_STOPWORDS = {
+_CUSTOM_STOPWORDS = frozenset({
     "of", "c:", "and", "the", "a", "an", "to", "in", "for", "by", "on",
     "with", "or", "if", "is", "at", "as", "all", "windows", "microsoft",
     "this", "that", "it", "not", "be", "are", "was", "were", "has", "have",
     "had", "do", "does", "did", "will", "would", "shall", "should", "may",
     "might", "can", "could", "no", "yes", "from", "but", "so", "than",
     "too", "very", "just", "about", "up", "out", "into",
-}
+})
 
 # ─── Sigma Field Name Blocklist ──────────────────────────────────────────────
 # These are Sigma rule structure field names / detection block keys that should
@@ -96,45 +118,69 @@ def _is_sigma_field_name(token: str) -> bool:
         return True
     return False
 
-_stopwords_cache: Optional[Set[str]] = None
+_stopwords_cache: Optional[frozenset] = None
 
 
-def _get_stopwords() -> Set[str]:
+def _get_stopwords() -> frozenset:
     global _stopwords_cache
     if _stopwords_cache is not None:
         return _stopwords_cache
     sw = set(_CUSTOM_STOPWORDS)
     try:
         from nltk.corpus import stopwords
-        sw |= set(stopwords.words("english"))
+        sw.update(w.lower() for w in stopwords.words("english"))
     except Exception:
         pass
-    _stopwords_cache = sw
-    return sw
+    _stopwords_cache = frozenset(sw)
+    return _stopwords_cache
 
 
 # ─── Tokenization ───────────────────────────────────────────────────────────
 _TOKEN_PATTERN = re.compile(r"[A-Za-z0-9\-\.:;\\/_]+")
 
+# ASCII fast path: map every non-token character to a space and split, which
+# is equivalent to _TOKEN_PATTERN.findall without running the regex engine.
+_TOKEN_CHARS = frozenset(string.ascii_letters + string.digits + "-.:;\\/_")
+_TOKEN_SEPARATORS = str.maketrans({c: " " for c in map(chr, range(128)) if c not in _TOKEN_CHARS})
+
+
+def _split_tokens(text: str) -> List[str]:
+    if text.isascii():
+        return text.translate(_TOKEN_SEPARATORS).split()
+    return _TOKEN_PATTERN.findall(text)
+
+
+# Tokens shorter than this are dropped before any lowercasing or stopword lookup
+_MIN_TOKEN_LEN = 3
+
 
 def _tokenize(text: str) -> List[str]:
     sw = _get_stopwords()
-    return [t for t in _TOKEN_PATTERN.findall(text) if len(t) >= 3 and t.lower() not in sw]
+    return [t for t in _split_tokens(text) if len(t) >= _MIN_TOKEN_LEN and t.lower() not in sw]
 
 
 def _tokenize_lower(text: str) -> Set[str]:
     sw = _get_stopwords()
-    return {t.lower() for t in _TOKEN_PATTERN.findall(text) if len(t) >= 3 and t.lower() not in sw}
+    return {tl for t in _split_tokens(text) if len(t) >= _MIN_TOKEN_LEN and (tl := t.lower()) not in sw}
 
 
 # ─── YAML Loading ───────────────────────────────────────────────────────────
 
 def _load_yaml_file(file_path: str, root_directory: str):
     try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            docs = list(yaml.load_all(f, Loader=Loader))
+        try:
+            # Hand CSafeLoader raw bytes: it detects the encoding and decodes in C
+            with open(file_path, "rb") as f:
+                docs = list(yaml.load_all(f, Loader=Loader))
+        except yaml.reader.ReaderError:
+            # Invalid UTF-8 somewhere in the file; decode leniently as before
+            with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
+                docs = list(yaml.load_all(f, Loader=Loader))
         results = []
-        relative = os.path.relpath(file_path, root_directory)
+        if file_path.startswith(root_directory):
+            relative = file_path[len(root_directory):].lstrip(os.sep)
+        else:
+            relative = os.path.relpath(file_path, root_directory)
         for doc in docs:
             if isinstance(doc, dict) and "title" in doc:
                 results.append({
@@ -147,32 +193,145 @@ def _load_yaml_file(file_path: str, root_directory: str):
         return None
 
 
+def _load_yaml_batch(file_paths: List[str], root_directory: str) -> Tuple[List[dict], int]:
+    """Parse a batch of rule files; returns (rules, error_count)."""
+    rules: List[dict] = []
+    errors = 0
+    for fp in file_paths:
+        result = _load_yaml_file(fp, root_directory)
+        if result:
+            rules.extend(result)
+        else:
+            errors += 1
+    return rules, errors
+
+
+def _rules_fingerprint(file_paths: List[str]) -> str:
+    """Hash the (path, mtime, size) of every rule file; changes on any edit."""
+    h = hashlib.blake2b(digest_size=16)
+    for fp in sorted(file_paths):
+        try:
+            st = os.stat(fp)
+        except OSError:
+            continue
+        h.update(f"{fp}\0{st.st_mtime_ns}\0{st.st_size}\n".encode("utf-8", "surrogateescape"))
+    return h.hexdigest()
+
+
+def _rules_cache_path(root_directory: str) -> str:
+    """Cache file for a rule tree, named by a hash of its absolute path."""
+    root_key = hashlib.blake2b(
+        os.path.abspath(root_directory).encode("utf-8", "surrogateescape"), digest_size=8
+    ).hexdigest()
+    return os.path.join(config.sigma_cache_dir, f"{SIGMA_CACHE_PREFIX}{root_key}.json")
+
+
+def _read_rules_cache(cache_path: str, fingerprint: str) -> Optional[List[dict]]:
+    try:
+        with open(cache_path, "rb") as f:
+            raw = f.read()
+        cached = orjson.loads(raw) if orjson is not None else json.loads(raw)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cached, dict) or cached.get("mtime_sha") != fingerprint:
+        return None
+    rules = cached.get("rules")
+    return rules if isinstance(rules, list) else None
+
+
+def _encode_rules_cache(fingerprint: str, rules: List[dict]) -> Optional[bytes]:
+    """Encode rules for the cache; returns None if they can't be serialized."""
+    doc = {"mtime_sha": fingerprint, "rules": rules}
+    try:
+        if orjson is not None:
+            return orjson.dumps(doc, default=str, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(doc, default=str, ensure_ascii=False).encode("utf-8")
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Sigma rules not cacheable: {e}")
+        return None
+
+
+def _write_rules_cache(cache_path: str, payload: bytes) -> None:
+    """
+    Atomically replace the cache file. Each writer gets its own temp file, so
+    concurrent cold loads in one process never write into the same file.
+    """
+    cache_dir = os.path.dirname(cache_path)
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write Sigma rules cache {cache_path}: {e}")
+        if tmp_path is not None:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _iter_rule_files(root_directory: str) -> Iterator[str]:
+    """
+    Yield every .yml/.yaml path under root_directory. Uses os.scandir so the
+    directory/file check comes from the cached d_type, not an extra stat().
+    Like os.walk, symlinked directories are not descended into and unreadable
+    directories are skipped.
+    """
+    stack = [root_directory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            stack.append(entry.path)
+                    elif entry.name.endswith((".yml", ".yaml")):
+                        yield entry.path
+        except OSError:
+            continue
+
+
 def load_sigma_rules_local(root_directory: str) -> List[dict]:
     """Load all Sigma rules from a directory tree."""
-    file_paths = []
-    for subdir, _, files in os.walk(root_directory):
-        for f in files:
-            if f.endswith((".yml", ".yaml")):
-                file_paths.append(os.path.join(subdir, f))
+    file_paths = list(_iter_rule_files(root_directory))
 
     logger.info(f"Found {len(file_paths)} YAML files in {root_directory}")
 
+    cache_path = _rules_cache_path(root_directory)
+    fingerprint = _rules_fingerprint(file_paths)
+    cached = _read_rules_cache(cache_path, fingerprint)
+    if cached is not None:
+        logger.info(f"Loaded {len(cached)} Sigma rules from cache {cache_path}")
+        return cached
+
     sigma_rules: List[dict] = []
     errors = 0
 
-    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-        futures = {executor.submit(_load_yaml_file, fp, root_directory): fp for fp in file_paths}
+    # Parsed in-process: callers are request threads in an already
+    # multi-threaded server, where forking worker processes risks deadlocks
+    # on locks held by other threads. Batches keep the future count small.
+    batch_size = max(1, math.ceil(len(file_paths) / (SIGMA_LOAD_WORKERS * 4)))
+    batches = [file_paths[i:i + batch_size] for i in range(0, len(file_paths), batch_size)]
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=SIGMA_LOAD_WORKERS) as executor:
+        futures = [executor.submit(_load_yaml_batch, batch, root_directory) for batch in batches]
         for future in concurrent.futures.as_completed(futures):
-            try:
-                result = future.result()
-                if result:
-                    sigma_rules.extend(result)
-                else:
-                    errors += 1
-            except Exception:
-                errors += 1
+            rules, failed = future.result()
+            sigma_rules.extend(rules)
+            errors += failed
 
     logger.info(f"Loaded {len(sigma_rules)} Sigma rules ({errors} errors)")
+
+    # Return the JSON round-tripped rules so cold and warm loads agree on
+    # value types (YAML dates come back as ISO strings either way), whether
+    # or not the cache file could be written.
+    payload = _encode_rules_cache(fingerprint, sigma_rules)
+    if payload is not None:
+        _write_rules_cache(cache_path, payload)
+        sigma_rules = orjson.loads(payload)["rules"] if orjson is not None else json.loads(payload)["rules"]
     return sigma_rules
 
 
@@ -186,7 +345,16 @@ class SigmaIndex:
         # Existing keyword index
         self.index: Dict[str, Set[int]] = defaultdict(set)
         self.rule_keywords: Dict[int, List[str]] = {}
-        self.rule_phrases: Dict[int, List[str]] = {}
+        self.rule_phrases: Dict[int, Tuple[str, ...]] = {}
+        # Lowercased keyword sets, precomputed so per-report matching is set algebra
+        self.rule_kw_set: Dict[int, frozenset] = {}
+        self.rule_detection_terms: Dict[int, frozenset] = {}
+        # Terms that could be shown as matched keywords (not Sigma field names)
+        self.rule_display_count: Dict[int, int] = {}
+        # TF-IDF inputs that don't depend on the report, filled in at build time
+        self.rule_tf: Dict[int, Dict[str, int]] = {}
+        self.rule_max_tf: Dict[int, int] = {}
+        self.idf: Dict[str, float] = {}
         self.doc_count = len(rules)
         self.df: Dict[str, int] = defaultdict(int)
 
@@ -202,6 +370,9 @@ class SigmaIndex:
         self.rule_status: Dict[int, str] = {}
         self.rule_level: Dict[int, str] = {}
 
+        # Aho-Corasick automaton over every detection phrase (None if unavailable)
+        self.phrase_automaton = None
+
         self._build_index()
 
     def _build_index(self):
@@ -209,19 +380,25 @@ class SigmaIndex:
         for idx, rule_info in enumerate(self.rules):
             rule_data = rule_info["rule_data"]
             detection = rule_data.get("detection", {})
-            keywords, phrases = self._extract_detection_terms(detection)
+            keywords, kw_set, phrases = self._extract_detection_terms(detection)
 
             self.rule_keywords[idx] = keywords
             self.rule_phrases[idx] = phrases
+            self.rule_kw_set[idx] = kw_set
+            self.rule_detection_terms[idx] = kw_set.union(phrases)
+            self.rule_display_count[idx] = sum(
+                1 for term in self.rule_detection_terms[idx] if not _is_sigma_field_name(term)
+            )
+            tf: Dict[str, int] = defaultdict(int)
+            for kw in keywords:
+                tf[kw.lower()] += 1
+            self.rule_tf[idx] = dict(tf)
+            self.rule_max_tf[idx] = max(tf.values()) if tf else 1
 
             # Keyword inverted index
-            seen: Set[str] = set()
-            for kw in keywords:
-                kw_lower = kw.lower()
+            for kw_lower in kw_set:
                 self.index[kw_lower].add(idx)
-                if kw_lower not in seen:
-                    self.df[kw_lower] += 1
-                    seen.add(kw_lower)
+                self.df[kw_lower] += 1
 
             # ── MITRE technique index ──
             techniques: Set[str] = set()
@@ -255,6 +432,19 @@ class SigmaIndex:
             self.rule_status[idx] = rule_data.get("status", "experimental")
             self.rule_level[idx] = rule_data.get("level", "medium")
 
+        n = self.doc_count + 1
+        self.idf = {term: math.log(n / (doc_freq + 1)) + 1 for term, doc_freq in self.df.items()}
+
+        if ahocorasick is not None:
+            automaton = ahocorasick.Automaton()
+            for phrases in self.rule_phrases.values():
+                for phrase in phrases:
+                    if phrase not in automaton:
+                        automaton.add_word(phrase, phrase)
+            if len(automaton):
+                automaton.make_automaton()
+                self.phrase_automaton = automaton
+
         logger.info(
             f"Built multi-signal index: {len(self.index)} keyword terms, "
             f"{len(self.technique_index)} technique IDs, "
@@ -262,8 +452,13 @@ class SigmaIndex:
             f"{self.doc_count} rules"
         )
 
-    def _extract_detection_terms(self, detection_data) -> Tuple[List[str], List[str]]:
-        """Extract keywords and multi-word phrases from detection data."""
+    def _extract_detection_terms(
+        self, detection_data
+    ) -> Tuple[List[str], frozenset, Tuple[str, ...]]:
+        """
+        Extract terms from detection data in one walk. Returns the keywords as
+        found, their lowercased set, and the lowercased multi-word phrases.
+        """
         if isinstance(detection_data, dict) and "condition" in detection_data:
             # Process all selections, not just 'selection'
             data_to_process = {
@@ -275,63 +470,83 @@ class SigmaIndex:
         else:
             data_to_process = detection_data
 
-        keywords: List[str] = []
-        phrases: List[str] = []
+        # Sets from the start: tokens are deduplicated as they are emitted
+        keywords: Set[str] = set()
+        keywords_lower: Set[str] = set()
+        phrases: Set[str] = set()
+        add_phrase = phrases.add
+        tokenize = _tokenize
+        lower = str.lower
+
+        def emit(tokens: List[str]) -> None:
+            keywords.update(tokens)
+            keywords_lower.update(map(lower, tokens))
+
+        # Walk the detection tree with an explicit stack rather than recursion:
+        # no per-node call frames and no RecursionError on deeply nested rules.
+        if isinstance(data_to_process, str):
+            emit(tokenize(data_to_process))
+            stack = []
+        else:
+            stack = [data_to_process]
 
-        def recurse(obj):
+        while stack:
+            obj = stack.pop()
             if isinstance(obj, dict):
-                for k, v in obj.items():
-                    # Skip dict keys — they are Sigma field names (Image, CommandLine, etc.)
-                    # NOT indicator values. We only want VALUES.
-                    if isinstance(v, str):
-                        if " " in v.strip() and len(v.strip()) > 3:
-                            phrases.append(v.strip().lower())
-                        keywords.extend(_tokenize(v))
-                    else:
-                        recurse(v)
+                # Skip dict keys — they are Sigma field names (Image, CommandLine, etc.)
+                # NOT indicator values. We only want VALUES.
+                children = obj.values()
             elif isinstance(obj, list):
-                for item in obj:
-                    if isinstance(item, str):
-                        if " " in item.strip() and len(item.strip()) > 3:
-                            phrases.append(item.strip().lower())
-                        keywords.extend(_tokenize(item))
-                    else:
-                        recurse(item)
-            elif isinstance(obj, str):
-                keywords.extend(_tokenize(obj))
-
-        recurse(data_to_process)
-        return list(set(keywords)), list(set(phrases))
+                children = obj
+            else:
+                continue
+            for value in children:
+                if isinstance(value, str):
+                    stripped = value.strip()
+                    if " " in stripped and len(stripped) > 3:
+                        add_phrase(stripped.lower())
+                    emit(tokenize(value))
+                elif isinstance(value, (dict, list)):
+                    stack.append(value)
+
+        return list(keywords), frozenset(keywords_lower), tuple(phrases)
 
     def find_candidates(self, query_tokens: Set[str]) -> Dict[int, int]:
         """Find candidate rules that share tokens with query."""
         candidates: Dict[int, int] = defaultdict(int)
-        for token in query_tokens:
-            if token in self.index:
-                for rule_idx in self.index[token]:
-                    candidates[rule_idx] += 1
+        index = self.index
+        for token in index.keys() & query_tokens:
+            for rule_idx in index[token]:
+                candidates[rule_idx] += 1
         return candidates
 
+    def find_phrases(self, text: str) -> Optional[Set[str]]:
+        """
+        Return every indexed phrase occurring in `text` using one linear
+        automaton pass, or None when pyahocorasick is not installed.
+        """
+        if self.phrase_automaton is None:
+            return None if ahocorasick is None else set()
+        return {phrase for _, phrase in self.phrase_automaton.iter(text)}
+
     def compute_tfidf_score(self, rule_idx: int, query_tokens: Set[str]) -> float:
-        """Compute TF-IDF relevance score for a rule against query tokens."""
+        """
+        Compute TF-IDF relevance score for a rule against query tokens.
+        Query tokens must already be lowercased (as gather_report_keywords returns them).
+        """
         keywords = self.rule_keywords.get(rule_idx, [])
         if not keywords:
             return 0.0
 
-        tf: Dict[str, int] = defaultdict(int)
-        for kw in keywords:
-            tf[kw.lower()] += 1
+        tf = self.rule_tf[rule_idx]
+        max_tf = self.rule_max_tf[rule_idx]
+        idf = self.idf
 
         score = 0.0
-        max_tf = max(tf.values()) if tf else 1
-
         for token in query_tokens:
-            token_lower = token.lower()
-            if token_lower in tf:
-                term_freq = 0.5 + 0.5 * (tf[token_lower] / max_tf)
-                doc_freq = self.df.get(token_lower, 0)
-                idf = math.log((self.doc_count + 1) / (doc_freq + 1)) + 1 if doc_freq > 0 else 1.0
-                score += term_freq * idf
+            count = tf.get(token)
+            if count:
+                score += (0.5 + 0.5 * (count / max_tf)) * idf[token]
 
         return score / (len(keywords) + 1)
 
@@ -353,30 +568,41 @@ def _get_or_build_index(rules: List[dict], root_directory: str) -> SigmaIndex:
 
 # ─── Report Signal Extraction ────────────────────────────────────────────────
 
-def gather_report_keywords(analysis_data: dict) -> Set[str]:
-    """Extract tokens from IoC and TTP fields (backward compat)."""
-    keywords: Set[str] = set()
+def _iter_report_values(analysis_data: dict) -> Iterator[str]:
+    """Yield every IoC, TTP, actor and tool string from the analysis data."""
     iocs = analysis_data.get("indicators_of_compromise", {})
-    for key, value in iocs.items():
+    for value in iocs.values():
         if isinstance(value, list):
             for item in value:
-                keywords |= _tokenize_lower(str(item))
+                yield str(item)
         elif isinstance(value, str):
-            keywords |= _tokenize_lower(value)
+            yield value
 
     for ttp in analysis_data.get("ttps", []):
         if isinstance(ttp, dict):
             for val in ttp.values():
-                keywords |= _tokenize_lower(str(val))
+                yield str(val)
         elif isinstance(ttp, str):
-            keywords |= _tokenize_lower(ttp)
+            yield ttp
 
     for actor in analysis_data.get("threat_actors", []):
-        keywords |= _tokenize_lower(str(actor))
+        yield str(actor)
 
     for tool in analysis_data.get("tools_or_malware", []):
-        keywords |= _tokenize_lower(str(tool))
+        yield str(tool)
+
 
+def gather_report_keywords(analysis_data: dict) -> Set[str]:
+    """Extract tokens from IoC and TTP fields (backward compat)."""
+    sw = _get_stopwords()
+    keywords: Set[str] = set()
+    # One generator feeds set.update, so no per-value temporary sets are built
+    keywords.update(
+        tl
+        for value in _iter_report_values(analysis_data)
+        for t in _split_tokens(value)
+        if len(t) >= _MIN_TOKEN_LEN and (tl := t.lower()) not in sw
+    )
     return keywords
 
 
@@ -400,7 +626,7 @@ def gather_report_signals(analysis_data: dict, mitre_techniques: list = None) ->
         ttp_str = str(ttp).upper() if isinstance(ttp, str) else ""
         if isinstance(ttp, dict):
             ttp_str = " ".join(str(v).upper() for v in ttp.values())
-        for m in re.finditer(r"T(\d{4}(?:\.\d{3})?)", ttp_str):
+        for m in _TTP_ID_RE.finditer(ttp_str):
             tid = "t" + m.group(1).lower()
             signals["techniques"].add(tid)
             # Also add parent technique
@@ -417,7 +643,7 @@ def gather_report_signals(analysis_data: dict, mitre_techniques: list = None) ->
                 tid_raw = tech
             else:
                 continue
-            for m in re.finditer(r"T(\d{4}(?:\.\d{3})?)", str(tid_raw).upper()):
+            for m in _TTP_ID_RE.finditer(str(tid_raw).upper()):
                 tid = "t" + m.group(1).lower()
                 signals["techniques"].add(tid)
                 parent = tid.split(".")[0]
@@ -457,8 +683,8 @@ def gather_report_signals(analysis_data: dict, mitre_techniques: list = None) ->
 
 # ─── Fuzzy Match ─────────────────────────────────────────────────────────────
 
-def _fuzzy_match(keyword: str, candidates: Set[str], threshold: float = 0.8) -> bool:
-    kw_lower = keyword.lower()
+def _fuzzy_match(kw_lower: str, candidates: Set[str], threshold: float = 0.8) -> bool:
+    """Fuzzy-match an already lowercased keyword against lowercased candidates."""
     for candidate in candidates:
         if kw_lower == candidate:
             return True
@@ -533,6 +759,10 @@ def build_github_link(rule_info: dict) -> str:
 
 # ─── Multi-Signal Matching Engine ────────────────────────────────────────────
 
+# Score multiplier by Sigma rule status
+_STATUS_WEIGHT = {"stable": 1.15, "test": 1.0, "experimental": 0.85}
+
+
 def _compute_ioc_field_score(
     index: SigmaIndex,
     rule_idx: int,
@@ -545,16 +775,17 @@ def _compute_ioc_field_score(
     if not ioc_values:
         return 0.0, []
 
-    rule_kws = set(kw.lower() for kw in index.rule_keywords.get(rule_idx, []))
-    rule_phrases = set(index.rule_phrases.get(rule_idx, []))
-    all_detection = rule_kws | rule_phrases
+    all_detection = index.rule_detection_terms.get(rule_idx, frozenset())
 
     if not all_detection:
         return 0.0, []
 
-    matched_iocs: List[str] = []
+    # Exact hits come straight from the set intersection; only the remaining
+    # values need the substring scan against every detection term.
+    exact = ioc_values & all_detection
+    matched_iocs: List[str] = [v for v in exact if len(v) >= 3]
     for ioc_val in ioc_values:
-        if not ioc_val or len(ioc_val) < 3:
+        if len(ioc_val) < 3 or ioc_val in exact:
             continue
         for det_term in all_detection:
             if ioc_val in det_term or det_term in ioc_val:
@@ -639,6 +870,9 @@ def match_sigma_rules_with_report(
 
     logger.info(f"Stage 4 (Keywords): {len(keyword_candidates)} keyword candidates")
 
+    # Scan the report once for every detection phrase across all rules
+    report_phrases = index.find_phrases(report_text) if report_text else set()
+
     # ═══════════════════════════════════════════════════════════════════════
     # COMBINE CANDIDATES from all stages
     # ═══════════════════════════════════════════════════════════════════════
@@ -651,45 +885,57 @@ def match_sigma_rules_with_report(
     results = []
 
     for rule_idx in all_candidates:
-        rule_info = index.rules[rule_idx]
-        rule_data = rule_info["rule_data"]
+        # A rule needs 3 displayable keyword matches; skip rules that can't have them
+        if index.rule_display_count.get(rule_idx, 0) < 3:
+            continue
 
         # ── MITRE score (0 or 1) ──
         mitre_score = 1.0 if rule_idx in technique_matches else 0.0
-        mitre_matched = sorted(technique_matches.get(rule_idx, set()))
 
         # ── Logsource score (0 or 1) ──
         logsource_score = 1.0 if rule_idx in logsource_relevant else 0.0
 
+        # Quality multiplier
+        status = index.rule_status.get(rule_idx, "experimental")
+        quality_mult = _STATUS_WEIGHT.get(status, 1.0)
+
+        # Upper bounds with the unknown scores at their maximum of 1.0: if even
+        # that can't reach the threshold, skip the expensive stages.
+        if (mitre_score * 40 + 25 + logsource_score * 15 + 20) * quality_mult < threshold:
+            continue
+
         # ── IoC field value match score (0 to 1) ──
         ioc_score, ioc_matched_values = _compute_ioc_field_score(
             index, rule_idx, signals["ioc_values"]
         )
 
+        if (mitre_score * 40 + ioc_score * 25 + logsource_score * 15 + 20) * quality_mult < threshold:
+            continue
+
         # ── Keyword / TF-IDF score (0 to 1) ──
         keyword_score = 0.0
         matched_keywords: Set[str] = set()
         phrase_matches: List[str] = []
 
-        keywords = index.rule_keywords.get(rule_idx, [])
+        kw_set = index.rule_kw_set.get(rule_idx, frozenset())
         phrases = index.rule_phrases.get(rule_idx, [])
 
-        if keywords or phrases:
-            # Keyword matching
-            for kw in keywords:
-                kw_lower = kw.lower()
-                if kw_lower in signals["keywords"]:
-                    matched_keywords.add(kw_lower)
-                elif use_fuzzy and _fuzzy_match(kw_lower, signals["keywords"]):
-                    matched_keywords.add(kw_lower)
+        if kw_set or phrases:
+            # Keyword matching: exact hits via set intersection, fuzzy on the rest
+            matched_keywords = signals["keywords"] & kw_set
+            if use_fuzzy:
+                for kw_lower in kw_set - matched_keywords:
+                    if _fuzzy_match(kw_lower, signals["keywords"]):
+                        matched_keywords.add(kw_lower)
 
             # Phrase matching
-            for phrase in phrases:
-                if phrase in report_text:
-                    phrase_matches.append(phrase)
-                    matched_keywords.add(phrase)
+            if report_phrases is not None:
+                phrase_matches = [p for p in phrases if p in report_phrases]
+            else:
+                phrase_matches = [p for p in phrases if p in report_text]
+            matched_keywords.update(phrase_matches)
 
-            total_terms = len(set(kw.lower() for kw in keywords)) + len(phrases)
+            total_terms = len(kw_set) + len(phrases)
             if total_terms > 0:
                 match_ratio = len(matched_keywords) / total_terms
                 tfidf = index.compute_tfidf_score(rule_idx, signals["keywords"])
@@ -703,10 +949,6 @@ def match_sigma_rules_with_report(
             keyword_score * 20
         )
 
-        # Quality multiplier
-        status = index.rule_status.get(rule_idx, "experimental")
-        quality_mult = {"stable": 1.15, "test": 1.0, "experimental": 0.85}.get(status, 1.0)
-
         combined_score = raw_score * quality_mult
 
         # Cap at 100
@@ -723,6 +965,10 @@ def match_sigma_rules_with_report(
         if len(display_keywords) < 3:
             continue
 
+        rule_info = index.rules[rule_idx]
+        rule_data = rule_info["rule_data"]
+        mitre_matched = sorted(technique_matches.get(rule_idx, set()))
+
         # ── Confidence label ──
         if combined_score >= 80:
             confidence = "Direct Hit"
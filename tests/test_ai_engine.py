@@ -0,0 +1,30 @@
+"""Regression tests for JSON extraction from AI responses."""
+
+import json
+
+from modules.ai_engine import extract_json_from_response
+
+
+def test_object_with_trailing_prose():
+    text = 'Here you go:\n{"a": "x}"}\nLet me know if {anything} else is needed.'
+    assert extract_json_from_response(text) == '{"a": "x}"}'
+
+
+def test_top_level_array_is_kept_whole():
+    text = '[{"a": 1}, {"b": 2}]'
+    assert json.loads(extract_json_from_response(text)) == [{"a": 1}, {"b": 2}]
+
+
+def test_array_after_prose_is_kept_whole():
+    text = 'Result:\n[{"a": 1}, {"b": 2}]\nDone.'
+    assert json.loads(extract_json_from_response(text)) == [{"a": 1}, {"b": 2}]
+
+
+def test_multiple_objects_are_not_cut_to_the_first():
+    text = '{"a": "x"} and also {"b": 2}'
+    assert extract_json_from_response(text) == text
+
+
+def test_truncated_object_falls_back_to_last_bracket():
+    text = 'Output: {"a": {"b": 1}'
+    assert extract_json_from_response(text) == '{"a": {"b": 1}'